@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import random
+import string
+import sys
+import typing
+
+
+# Seeded inputs for every exercise, `size` units long: intervals for ex1,
+# list elements for ex2, students for ex3/ex4 and photos for ex5. Each unit
+# is broken with probability `error_rate`, half of the time so that it no
+# longer parses and half of the time so that it parses but breaks a rule
+# the exercise checks (bounds out of order, a repeated student, ...);
+# albums have no such rule, so theirs are all syntax errors.
+# The same arguments always give the same text.
+
+
+def _word(rng: random.Random, low: int = 2, high: int = 9) -> str:
+    return ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(low, high)))
+
+
+def _class_id(n: int) -> str:
+
+    class_id: str = ''
+    while True:
+        class_id = string.ascii_uppercase[n % 26] + class_id
+        n = n // 26 - 1
+        if n < 0:
+            return class_id
+
+
+# ex1: "+ [1,4] [6,9] ..." on one line, or descending after "-"
+def intervals(size: int, error_rate: float = 0.0, seed: int = 0) -> str:
+
+    rng: random.Random = random.Random(seed)
+
+    ascending: bool = rng.random() < 0.5
+    parts: list[str] = ['+' if ascending else '-']
+    bound: int = 0 if ascending else 10 * size
+
+    for _ in range(size):
+
+        step: int = rng.randint(1, 5)
+        (lo, hi) = (bound + 1, bound + 1 + step) if ascending else (bound - 1, bound - 1 - step)
+        bound = hi
+
+        if rng.random() < error_rate:
+            if rng.random() < 0.5:
+                parts.append(f"[{lo},{hi}")
+            else:
+                parts.append(f"[{hi},{lo}]")
+        else:
+            parts.append(f"[{lo},{hi}]")
+
+    return ' '.join(parts) + '\n'
+
+
+# ex2: "lista 1, ab, agora, 3, 4, fim, cd ."
+def lists(size: int, error_rate: float = 0.0, seed: int = 0) -> str:
+
+    rng: random.Random = random.Random(seed)
+
+    elements: list[str] = list()
+
+    while len(elements) < size:
+
+        if rng.random() < error_rate:
+            # a word where only numbers may go, or a comma too many
+            elements.extend(['agora', _word(rng), 'fim'] if rng.random() < 0.5 else [''])
+
+        elif rng.random() < 0.1 and size - len(elements) >= 3:
+            run: int = rng.randint(1, min(8, size - len(elements) - 2))
+            elements.append('agora')
+            elements.extend(str(rng.randint(0, 999)) for _ in range(run))
+            elements.append('fim')
+
+        elif rng.random() < 0.5:
+            elements.append(str(rng.randint(0, 999)))
+
+        else:
+            word: str = _word(rng)
+            elements.append(word if word not in ('agora', 'fim') else word + 'x')
+
+    return 'lista ' + ', '.join(elements) + ' .\n'
+
+
+# ex3/ex4: the classes of a roster, as (class_id, [(name, grades)]), of up
+# to class_size students each; a broken student has no grades or the name
+# of one before it. Names are unique to the roster unless `names` is given:
+# then every class draws its students from one pool of that many names, so
+# that they come back from class to class as in a real school.
+def roster_classes(size: int, error_rate: float = 0.0, seed: int = 0, class_size: int = 1000,
+                   names: int = 0) -> typing.Iterator[tuple[str, list[tuple[str, list[int]]]]]:
+
+    rng: random.Random = random.Random(seed)
+
+    pool: list[str] = list(dict.fromkeys(_word(rng, 3, 10) for _ in range(names)))
+    if pool and len(pool) < min(class_size, size):
+        raise ValueError(f"a pool of {len(pool)} names can't fill a class of {class_size}")
+
+    remaining: int = size
+    class_count: int = 0
+
+    while remaining > 0:
+
+        students: list[tuple[str, list[int]]] = list()
+        seen: list[str] = list()
+
+        drawn: list[str] = rng.sample(pool, min(class_size, remaining)) if pool else None
+
+        for i in range(min(class_size, remaining)):
+
+            # drawn without replacement, or suffixed with the position, names
+            # are unique within the class
+            name: str = (
+                drawn[i] if drawn is not None
+                else _word(rng, 3, 8) + ''.join(string.ascii_lowercase[int(d)] for d in str(i))
+            )
+            grades: list[int] = [rng.randint(0, 20) for _ in range(rng.randint(1, 8))]
+
+            if rng.random() < error_rate:
+                if rng.random() < 0.5 or not seen:
+                    grades = list()
+                else:
+                    name = rng.choice(seen)
+
+            seen.append(name)
+            students.append((name, grades))
+
+        yield (_class_id(class_count), students)
+
+        class_count += 1
+        remaining -= len(students)
+
+
+# ex3/ex4: "TURMA A\nana (1, 2);\nze (3)." the classes above as text
+def roster(size: int, error_rate: float = 0.0, seed: int = 0, class_size: int = 1000,
+           names: int = 0) -> str:
+
+    blocks: list[str] = list()
+
+    for (class_id, students) in roster_classes(size, error_rate, seed, class_size, names):
+        body: str = ';\n'.join(f"{name} ({', '.join(map(str, grades))})" for (name, grades) in students)
+        blocks.append(f"TURMA {class_id}\n{body}.\n")
+
+    return ''.join(blocks)
+
+
+# ex5: cover, "[" then separators and sheets of photos "]", backcover
+def album(size: int, error_rate: float = 0.0, seed: int = 0, sheet_size: int = 12) -> str:
+
+    rng: random.Random = random.Random(seed)
+
+    def words(k: int) -> str:
+        return ' '.join(_word(rng) for _ in range(k))
+
+    parts: list[str] = [f'"{words(4)}"\n"{words(2)}"\n01-02-2003\n[\n']
+    photo: int = 0
+
+    while photo < size:
+
+        parts.append(f'    "{words(rng.randint(1, 5))}"\n')
+
+        for _ in range(min(rng.randint(1, 2 * sheet_size), size - photo)):
+
+            photo += 1
+
+            if rng.random() < error_rate:
+                # a photo without its caption, or a file name that isn't one
+                parts.append(
+                    f'    img{photo}\n' if rng.random() < 0.5 else f'    img-{photo}\n    "{words(2)}"\n'
+                )
+            else:
+                parts.append(f'    img{photo}\n    "{words(rng.randint(2, 10))}"\n')
+
+    parts.append(f']\n"{words(3)}"\n04-05-2006\n')
+
+    return ''.join(parts)
+
+
+GENERATORS: dict[str, callable] = {
+    'intervals': intervals,
+    'lists':     lists,
+    'roster':    roster,
+    'album':     album,
+}
+
+EXTENSIONS: dict[str, str] = {
+    'intervals': '.txt',
+    'lists':     '.txt',
+    'roster':    '.txt',
+    'album':     '.album',
+}
+
+
+def main():
+
+    argp: argparse.ArgumentParser = argparse.ArgumentParser(
+        description='write seeded inputs for the exercises'
+    )
+    argp.add_argument('language', choices=GENERATORS)
+    argp.add_argument('size', type=int, help='intervals, elements, students or photos per document')
+    argp.add_argument('--errors', type=float, default=0.0, metavar='RATE',
+                      help='probability of breaking each unit')
+    argp.add_argument('--seed', type=int, default=0)
+    argp.add_argument('--count', type=int, default=1,
+                      help='documents to write, seeded seed, seed + 1, ...')
+    argp.add_argument('-o', '--output', metavar='DIR',
+                      help='write one file per document into DIR instead of to stdout')
+    args: argparse.Namespace = argp.parse_args()
+
+    generate: callable = GENERATORS[args.language]
+
+    if args.output is not None:
+        os.makedirs(args.output, exist_ok=True)
+
+    for i in range(args.count):
+
+        text: str = generate(args.size, args.errors, args.seed + i)
+
+        if args.output is None:
+            sys.stdout.write(text)
+        else:
+            fn: str = f"{args.language}-{args.seed + i:05d}{EXTENSIONS[args.language]}"
+            with open(os.path.join(args.output, fn), 'w') as fh:
+                fh.write(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+import lark
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, os.path.join(ROOT, 'ex4'))
+sys.path.insert(0, os.path.join(ROOT, 'ex3'))
+
+import corpus
+import students_exercise
+import interpreter
+
+from roster import Roster
+
+
+# Both roster front-ends end in the same Roster, so what sets them apart is
+# how they get there: the transformer either after a tree is built or inside
+# the LALR parser, the interpreter over a tree with the stock recursive
+# engine or the explicit-stack one. "core only" feeds the Roster straight
+# from the generated data, as a floor for the rest.
+
+def core_only(students: list) -> Roster:
+
+    roster: Roster = Roster()
+
+    for (class_id, class_students) in students:
+        roster.add_class(class_id, class_students)
+
+    return roster
+
+
+def main():
+
+    sizes: list[int] = [int(n) for n in sys.argv[1:]] or [10**2, 10**3, 10**4, 10**5]
+
+    lalr: lark.Lark = lark.Lark(students_exercise.grammar, parser='lalr')
+    transformer_tree: students_exercise.RosterParser = students_exercise.tree_parser(lalr)
+
+    paths: dict[str, callable] = {
+        'core only':              lambda text, data: core_only(data),
+        'transformer, tree':      lambda text, data: transformer_tree(text).roster,
+        'transformer, inline':    lambda text, data: students_exercise.inline_parse(text).roster,
+        'interpreter, stock':     lambda text, data: interpreter.ClassInterpreter().visit(lalr.parse(text)),
+        'interpreter, iterative': lambda text, data: interpreter.IterativeClassInterpreter().visit(lalr.parse(text)),
+    }
+
+    print(f"{'students':>10} {'path':<23} {'time (s)':>10} {'students/s':>12} {'peak (MiB)':>11}")
+
+    for n in sizes:
+
+        text: str = corpus.roster(n)
+        data: list = list(corpus.roster_classes(n))
+
+        for (path, run) in paths.items():
+
+            begin: float = time.perf_counter()
+            roster: Roster = run(text, data)
+            elapsed: float = time.perf_counter() - begin
+
+            assert roster.number_of_students == n
+            del roster
+
+            tracemalloc.start()
+            run(text, data)
+            peak: int = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            print(f"{n:>10} {path:<23} {elapsed:>10.3f} {n / elapsed:>12.0f} {peak / 2**20:>11.1f}")
+
+        print()
+
+
+if __name__ == '__main__':
+    main()
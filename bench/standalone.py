@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+for ex in ('ex5', 'ex3', 'ex2'):
+    sys.path.insert(0, os.path.join(ROOT, ex))
+
+import lark
+
+import corpus
+import lists_exercise3
+import students_exercise
+import albums
+
+
+# Sets the parsers `make standalone` generates against the lark.Lark(...)
+# they stand in for, on what it costs to get one and then to use it: the
+# import, in a fresh interpreter, of lark or of the standalone module;
+# building the parser, from the grammar as the exercises did (and with
+# lark's cache, as ex3 does) or from the generated tables; and parsing a
+# generated document into a tree, both parsers being LALR with the
+# contextual lexer.
+
+# name -> (directory, standalone module, grammar, start rule, corpus)
+GRAMMARS: dict[str, tuple[str, str, str, str, str]] = {
+    'lists':  ('ex2', 'lists_standalone', lists_exercise3.grammar, 'start', 'lists'),
+    'roster': ('ex3', 'roster_standalone', students_exercise.grammar, 'start', 'roster'),
+    'album':  ('ex5', 'album_standalone', albums.grammar, 'album', 'album'),
+}
+
+
+def best_of(repeat: int, f: callable, *args) -> float:
+
+    best: float = float('inf')
+
+    for _ in range(repeat):
+        begin: float = time.perf_counter()
+        f(*args)
+        best = min(best, time.perf_counter() - begin)
+
+    return best
+
+
+# measured inside the child, so that starting the interpreter isn't counted
+def import_time(module: str, directory: str, repeat: int) -> float:
+
+    code: str = (
+        'import time\n'
+        + 'begin = time.perf_counter()\n'
+        + f'import {module}\n'
+        + 'print(time.perf_counter() - begin)\n'
+    )
+    env: dict[str, str] = dict(os.environ, PYTHONPATH=os.path.join(ROOT, directory))
+
+    return min(
+        float(subprocess.run([sys.executable, '-c', code], env=env, capture_output=True,
+                             text=True, check=True).stdout)
+        for _ in range(repeat)
+    )
+
+
+def main():
+
+    argp: argparse.ArgumentParser = argparse.ArgumentParser(
+        description='time the standalone parsers against lark.Lark'
+    )
+    argp.add_argument('grammars', nargs='*', metavar='GRAMMAR',
+                      help=f"out of {', '.join(GRAMMARS)} (default: all of them)")
+    argp.add_argument('--size', type=int, default=10**4,
+                      help='units per generated document (default: %(default)s)')
+    argp.add_argument('--repeat', type=int, default=5,
+                      help='runs of each measurement, of which the best is kept')
+    args: argparse.Namespace = argp.parse_args()
+
+    for name in args.grammars:
+        if name not in GRAMMARS:
+            argp.error(f"no grammar {name!r}, not one of {', '.join(GRAMMARS)}")
+
+    print(f"{'grammar':<8} {'parser':<16} {'import (ms)':>12} {'build (ms)':>11} "
+          + f"{'parse (s)':>10} {'MiB/s':>8}")
+
+    for name in args.grammars or GRAMMARS:
+
+        (directory, module, grammar, start, language) = GRAMMARS[name]
+
+        standalone = sys.modules.get(module)
+        if standalone is None:
+            print(f"{name:<8} no {module}, run `make standalone` in {directory}", file=sys.stderr)
+            continue
+
+        text: str = corpus.GENERATORS[language](args.size)
+        size: float = len(text.encode()) / 2**20
+
+        def build(**options) -> lark.Lark:
+            return lark.Lark(grammar, parser='lalr', lexer='contextual', start=start, **options)
+
+        dynamic: lark.Lark = build()
+        generated: lark.Lark = standalone.Lark_StandAlone()
+
+        # lark's Tree compares equal to the standalone one when they hold the same
+        assert generated.parse(text) == dynamic.parse(text), f"{name}: the parsers disagree"
+
+        # once to leave the cache file behind
+        build(cache=True)
+
+        rows: list[tuple[str, float, float, lark.Lark]] = [
+            ('lark.Lark', import_time('lark', directory, args.repeat),
+             best_of(args.repeat, build), dynamic),
+            ('lark.Lark, cache', None,
+             best_of(args.repeat, lambda: build(cache=True)), dynamic),
+            ('standalone', import_time(module, directory, args.repeat),
+             best_of(args.repeat, standalone.Lark_StandAlone), generated),
+        ]
+
+        for (parser, imported, built, instance) in rows:
+
+            parse: float = best_of(args.repeat, instance.parse, text)
+            imported_ms: str = '-' if imported is None else f"{imported * 1000:.1f}"
+
+            print(f"{name:<8} {parser:<16} {imported_ms:>12} {built * 1000:>11.2f} "
+                  + f"{parse:>10.3f} {size / parse:>8.2f}")
+
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+for ex in ('ex5', 'ex4', 'ex3', 'ex2', 'ex1'):
+    sys.path.insert(0, os.path.join(ROOT, ex))
+
+import lark
+import ply
+import ply.yacc
+
+import corpus
+import intervalos_lex
+import intervalos_yacc
+import lists_exercise3
+import students_exercise
+import interpreter
+import albums
+
+
+# what the inline workloads raise, which may come from standalone parsers
+SYNTAX_ERRORS: tuple[type, ...] = (*students_exercise.SYNTAX_ERRORS, *albums.SYNTAX_ERRORS)
+
+
+# A workload turns a document into its results and reports how long the
+# parse and the transform took, the latter None where the two can't be
+# told apart (PLY actions, transformers run inside an LALR parser).
+# Anything the exercises print goes to /dev/null.
+
+Timings = tuple[float, float]
+
+
+def _timed(f: callable, *args) -> tuple[float, object]:
+    begin: float = time.perf_counter()
+    result: object = f(*args)
+    return (time.perf_counter() - begin, result)
+
+
+def ex1_intervals() -> callable:
+
+    # write_tables and debug off, or yacc leaves parsetab.py and parser.out behind
+    parser = ply.yacc.yacc(module=intervalos_yacc, write_tables=False, debug=False)
+    intervalos_yacc.parser = parser
+
+    def run(text: str) -> Timings:
+
+        intervalos_yacc.start_line(text)
+
+        (parse, _) = _timed(parser.parse, text, intervalos_lex.lexer.clone())
+        return (parse, None)
+
+    return run
+
+
+def tree_workload(parser: lark.Lark, transform: callable) -> callable:
+
+    def run(text: str) -> Timings:
+        (parse, tree) = _timed(parser.parse, text)
+        (trans, _) = _timed(transform, tree)
+        return (parse, trans)
+
+    return run
+
+
+def ex2_lists() -> callable:
+    return tree_workload(
+        lark.Lark(lists_exercise3.grammar),
+        lambda tree: lists_exercise3.ListTransformer().transform(tree)
+    )
+
+
+def ex3_tree() -> callable:
+    return tree_workload(
+        lark.Lark(students_exercise.grammar),
+        lambda tree: students_exercise.ClassTransformer().transform(tree)
+    )
+
+
+def ex3_inline() -> callable:
+
+    def run(text: str) -> Timings:
+        (parse, _) = _timed(students_exercise.inline_parse, text)
+        return (parse, None)
+
+    return run
+
+
+def ex4_stock() -> callable:
+    return tree_workload(
+        lark.Lark(interpreter.grammar),
+        lambda tree: interpreter.ClassInterpreter().visit(tree)
+    )
+
+
+def ex4_iterative() -> callable:
+    return tree_workload(
+        lark.Lark(interpreter.grammar),
+        lambda tree: interpreter.IterativeClassInterpreter().visit(tree)
+    )
+
+
+def ex5_tree() -> callable:
+    return tree_workload(
+        lark.Lark(albums.grammar, start='album'),
+        lambda tree: albums.AlbumInterpreter(sys.stdout).visit(tree)
+    )
+
+
+def ex5_inline() -> callable:
+
+    emitter: albums.AlbumEmitter = albums.AlbumEmitter()
+    parser: lark.Lark = albums.inline_parser(emitter)
+
+    def run(text: str) -> Timings:
+        emitter.begin(sys.stdout)
+        (parse, _) = _timed(parser.parse, text)
+        return (parse, None)
+
+    return run
+
+
+def count_lark_tokens(grammar: str, start: str) -> callable:
+
+    # an LALR parser that counts every token it is handed; the contextual
+    # lexer sees the same tokens the exercise's own parser does. %ignore'd
+    # terminals go through the callbacks too, but are no tokens of the parse
+    count: list[int] = [0]
+
+    def tick(t: lark.Token) -> lark.Token:
+        count[0] += 1
+        return t
+
+    plain: lark.Lark = lark.Lark(grammar, parser='lalr', start=start)
+    terminals: list[str] = [t.name for t in plain.terminals if t.name not in plain.ignore_tokens]
+    counter: lark.Lark = lark.Lark(
+        grammar, parser='lalr', start=start, lexer_callbacks={name: tick for name in terminals}
+    )
+
+    def count_tokens(text: str) -> int:
+        count[0] = 0
+        try:
+            counter.parse(text)
+        except (lark.UnexpectedInput, lark.GrammarError):
+            pass
+        return count[0]
+
+    return count_tokens
+
+
+def count_ply_tokens(text: str) -> int:
+
+    lexer = intervalos_lex.lexer.clone()
+    lexer.input(text)
+
+    return sum(1 for _ in iter(lexer.token, None))
+
+
+# name -> (corpus, workload, token counter, largest size it is run at)
+WORKLOADS: dict[str, tuple[str, callable, callable, int]] = {
+    'ex1':           ('intervals', ex1_intervals, lambda: count_ply_tokens, 10**5),
+    'ex2':           ('lists', ex2_lists, lambda: count_lark_tokens(lists_exercise3.grammar, 'start'), 10**5),
+    'ex3.tree':      ('roster', ex3_tree, lambda: count_lark_tokens(students_exercise.grammar, 'start'), 10**4),
+    'ex3.inline':    ('roster', ex3_inline, lambda: count_lark_tokens(students_exercise.grammar, 'start'), 10**6),
+    'ex4.stock':     ('roster', ex4_stock, lambda: count_lark_tokens(interpreter.grammar, 'start'), 10**4),
+    'ex4.iterative': ('roster', ex4_iterative, lambda: count_lark_tokens(interpreter.grammar, 'start'), 10**4),
+    'ex5.tree':      ('album', ex5_tree, lambda: count_lark_tokens(albums.grammar, 'album'), 2 * 10**4),
+    'ex5.inline':    ('album', ex5_inline, lambda: count_lark_tokens(albums.grammar, 'album'), 10**6),
+}
+
+
+def measure(name: str, size: int, error_rate: float, seed: int) -> dict:
+
+    (language, make, make_counter, _) = WORKLOADS[name]
+
+    text: str = corpus.GENERATORS[language](size, error_rate, seed)
+    run: callable = make()
+    tokens: int = make_counter()(text)
+
+    # a document that fails is timed up to the error, all of it as parsing
+    def attempt() -> tuple[Timings, bool]:
+        begin: float = time.perf_counter()
+        try:
+            return (run(text), True)
+        except (*SYNTAX_ERRORS, lark.GrammarError):
+            return ((time.perf_counter() - begin, None), False)
+
+    with open(os.devnull, 'w') as devnull, \
+            contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+
+        ((parse, transform), ok) = attempt()
+
+        tracemalloc.start()
+        try:
+            attempt()
+            peak: int = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    total: float = parse + (transform or 0.0)
+
+    # with errors, `tokens` only counts up to the first one the counting parser met
+    return {
+        'module':       name,
+        'corpus':       language,
+        'size':         size,
+        'ok':           ok,
+        'tokens':       tokens,
+        'parse_s':      parse,
+        'transform_s':  transform,
+        'tokens_per_s': tokens / total if total > 0 else None,
+        'peak_mib':     peak / 2**20,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_result(r: dict, baseline: dict = None):
+
+    transform: str = '-' if r['transform_s'] is None else f"{r['transform_s']:.3f}"
+    line: str = (
+        f"{r['module']:<14} {r['size']:>8} {r['parse_s']:>10.3f} {transform:>10} "
+        + f"{r['tokens_per_s'] or 0:>12.0f} {r['peak_mib']:>10.1f}"
+    )
+
+    if baseline is not None and baseline.get('tokens_per_s') and r['tokens_per_s']:
+        line += f" {r['tokens_per_s'] / baseline['tokens_per_s']:>8.2f}x"
+
+    if not r['ok']:
+        line += ' (failed)'
+
+    print(line)
+
+
+def main():
+
+    argp: argparse.ArgumentParser = argparse.ArgumentParser(
+        description='time every exercise on generated inputs and save the results as JSON'
+    )
+    argp.add_argument('sizes', nargs='*', type=int, default=[10**3, 10**4],
+                      help='units per document (default: 1000 10000)')
+    argp.add_argument('--only', nargs='+', choices=WORKLOADS, metavar='MODULE',
+                      help=f"modules to run, out of {', '.join(WORKLOADS)}")
+    argp.add_argument('--errors', type=float, default=0.0, metavar='RATE',
+                      help='probability of breaking each unit of the inputs')
+    argp.add_argument('--seed', type=int, default=0)
+    argp.add_argument('-o', '--output', metavar='FILE',
+                      help='where to save the results (default: suite-<commit>.json)')
+    argp.add_argument('--compare', metavar='FILE',
+                      help='results of an earlier run, to show the change in tokens/s against')
+    args: argparse.Namespace = argp.parse_args()
+
+    commit: str = git_commit()
+
+    baseline: dict[tuple[str, int], dict] = dict()
+    if args.compare is not None:
+        with open(args.compare) as fh:
+            baseline = {(r['module'], r['size']): r for r in json.load(fh)['results']}
+
+    print(f"{'module':<14} {'size':>8} {'parse (s)':>10} {'trans (s)':>10} "
+          + f"{'tokens/s':>12} {'peak (MiB)':>10}" + (f" {'vs base':>8}" if baseline else ''))
+
+    results: list[dict] = list()
+
+    for size in args.sizes:
+        for name in (args.only or WORKLOADS):
+
+            if size > WORKLOADS[name][3]:
+                continue
+
+            r: dict = measure(name, size, args.errors, args.seed)
+            results.append(r)
+            print_result(r, baseline.get((name, size)))
+
+    report: dict = {
+        'commit':     commit,
+        'date':       datetime.datetime.now().isoformat(timespec='seconds'),
+        'python':     platform.python_version(),
+        'lark':       lark.__version__,
+        'ply':        ply.__version__,
+        'machine':    platform.machine(),
+        'cpus':       os.cpu_count(),
+        'errors':     args.errors,
+        'seed':       args.seed,
+        'results':    results,
+    }
+
+    output: str = args.output or f"suite-{(commit or 'unknown')[:12]}.json"
+    with open(output, 'w') as fh:
+        json.dump(report, fh, indent=2)
+
+    print(f"\nresults saved to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+import lark
+import os
+import typing
+
+
+def encode(tree: lark.Tree) -> tuple:
+    # trees become (data, [children]) and tokens (type, value); positions are dropped
+    return (
+        str(tree.data),
+        [
+            encode(c) if isinstance(c, lark.Tree) else (c.type, str(c))
+            for c in tree.children
+        ]
+    )
+
+
+def decode(node: tuple) -> lark.Tree:
+    return lark.Tree(
+        node[0],
+        [
+            decode(c) if isinstance(c[1], list) else lark.Token(c[0], c[1])
+            for c in node[1]
+        ]
+    )
+
+
+class DiskCache:
+
+    # A directory of entries, one file per key ending in `suffix`, kept under
+    # max_bytes by least recent use: reading an entry refreshes its mtime,
+    # and once the directory grows past max_bytes the entries read least
+    # recently are removed. The caches built on it decide what a key is and
+    # what the bytes of an entry hold.
+    #
+    # Several processes may share the directory. Each keeps its own count of
+    # the bytes in it, so an eviction starts by counting them again.
+
+    _directory: str
+    _suffix: str
+    _max_bytes: int
+
+    # bytes in the directory, counted on the first write and kept up from there
+    _total: int
+
+    def __init__(self, directory: str, suffix: str, max_bytes: int = 64 * 2**20):
+        self._directory = directory
+        self._suffix    = suffix
+        self._max_bytes = max_bytes
+        self._total     = None
+
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._directory, key + self._suffix)
+
+    def _entries(self) -> list[os.DirEntry]:
+        return [e for e in os.scandir(self._directory) if e.name.endswith(self._suffix)]
+
+    def read(self, key: str) -> typing.Optional[bytes]:
+
+        path: str = self._path(key)
+
+        try:
+            with open(path, 'rb') as fh:
+                data: bytes = fh.read()
+        except FileNotFoundError:
+            return None
+
+        os.utime(path)
+        return data
+
+    # for an entry that turned out to be unreadable
+    def discard(self, key: str):
+
+        path: str = self._path(key)
+
+        try:
+            size: int = os.stat(path).st_size
+            os.remove(path)
+        except FileNotFoundError:
+            return
+
+        if self._total is not None:
+            self._total -= size
+
+    def write(self, key: str, data: bytes):
+
+        path: str = self._path(key)
+
+        if self._total is None:
+            self._total = sum(e.stat().st_size for e in self._entries())
+
+        # an entry written again replaces the bytes it held
+        try:
+            self._total -= os.stat(path).st_size
+        except FileNotFoundError:
+            pass
+
+        # written aside and renamed, so a reader never sees half an entry
+        tmp: str = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+
+        self._total += len(data)
+        if self._total > self._max_bytes:
+            self._evict()
+
+    def _evict(self):
+
+        live: list[tuple[os.DirEntry, os.stat_result]] = list()
+        for e in self._entries():
+            try:
+                live.append((e, e.stat()))
+            # taken by another process sharing the directory
+            except FileNotFoundError:
+                pass
+
+        total: int = sum(s.st_size for (_, s) in live)
+
+        for (e, s) in sorted(live, key=lambda es: es[1].st_mtime):
+
+            if total <= self._max_bytes:
+                break
+
+            try:
+                os.remove(e.path)
+            except FileNotFoundError:
+                pass
+
+            total -= s.st_size
+
+        self._total = total
@@ -0,0 +1,176 @@
+import contextlib
+import sys
+import tracemalloc
+import typing
+
+
+class _PhaseMemory:
+
+    __slots__ = ('calls', 'peak', 'growth', 'retained', 'sites')
+
+    calls: int
+
+    # highest traced total while the phase ran, and how far above its start
+    peak: int
+    growth: int
+
+    # what the phase left allocated, summed over its runs
+    retained: int
+
+    # file:line -> [bytes, blocks] still allocated there when the phase ended
+    sites: dict[str, list[int]]
+
+    def __init__(self):
+        self.calls    = 0
+        self.peak     = 0
+        self.growth   = 0
+        self.retained = 0
+        self.sites    = dict()
+
+
+class MemoryProfiler:
+
+    # Takes tracemalloc snapshots where a phase begins and ends and keeps,
+    # for each phase name, its peak, how much it left allocated behind it
+    # (the tree a parse hands to the transform, the HTML an emit buffers)
+    # and the lines those bytes were allocated at.
+    #
+    # The snapshot taken at the start stays alive while the phase runs, so
+    # its size is taken off the peak, and tracemalloc's own allocations are
+    # left out of the sites. Phases may nest; reset_peak() is called at
+    # every boundary, so the peak an inner phase reaches is carried over to
+    # the one enclosing it by hand.
+    #
+    # Tracing slows everything down several times over, and every snapshot
+    # walks the whole traced heap: the timings of a run with it on are not
+    # worth reading. A disabled profiler never starts tracemalloc and its
+    # phases are a shared null context.
+
+    enabled: bool
+
+    _phases: dict[str, _PhaseMemory]
+
+    # [highest traced total seen since the phase began] of every phase running
+    _stack: list[list[int]]
+
+    # whether tracemalloc was started here, and so is to be stopped by report()
+    _started: bool
+    _frames: int
+
+    # sites left out of the report; filtering the snapshots themselves
+    # takes longer than the phases do
+    _IGNORED: frozenset[str] = frozenset((
+        tracemalloc.__file__,
+        __file__,
+        '<frozen importlib._bootstrap>',
+        '<frozen importlib._bootstrap_external>',
+        '<unknown>',
+    ))
+
+    _NULL_CONTEXT: contextlib.nullcontext = contextlib.nullcontext()
+
+    def __init__(self, enabled: bool = True, frames: int = 1):
+        self.enabled  = enabled
+
+        self._phases  = dict()
+        self._stack   = list()
+        self._started = False
+        self._frames  = frames
+
+    def phase(self, name: str) -> typing.ContextManager:
+
+        if not self.enabled:
+            return self._NULL_CONTEXT
+
+        return self._phase(name)
+
+    @contextlib.contextmanager
+    def _phase(self, name: str):
+
+        # only from the first phase on, so building the parsers isn't traced
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self._frames)
+            self._started = True
+
+        (current, peak) = tracemalloc.get_traced_memory()
+
+        # the peak so far belongs to the phase this one is nested in
+        if self._stack:
+            self._stack[-1][0] = max(self._stack[-1][0], peak)
+
+        before: tracemalloc.Snapshot = tracemalloc.take_snapshot()
+
+        # what the snapshot itself holds
+        start: int = tracemalloc.get_traced_memory()[0]
+        overhead: int = start - current
+
+        frame: list[int] = [start]
+        self._stack.append(frame)
+        tracemalloc.reset_peak()
+
+        try:
+            yield
+
+        finally:
+            (end, peak) = tracemalloc.get_traced_memory()
+            peak = max(peak, frame[0])
+            self._stack.pop()
+
+            if self._stack:
+                self._stack[-1][0] = max(self._stack[-1][0], peak)
+
+            after: tracemalloc.Snapshot = tracemalloc.take_snapshot()
+
+            stats: _PhaseMemory = self._phases.setdefault(name, _PhaseMemory())
+            stats.calls    += 1
+            stats.peak      = max(stats.peak, peak - overhead)
+            stats.growth    = max(stats.growth, peak - start)
+            stats.retained += end - start
+
+            for diff in after.compare_to(before, 'lineno'):
+                frame0: tracemalloc.Frame = diff.traceback[0]
+                if diff.size_diff == 0 or frame0.filename in self._IGNORED:
+                    continue
+                site: list[int] = stats.sites.setdefault(f"{frame0.filename}:{frame0.lineno}", [0, 0])
+                site[0] += diff.size_diff
+                site[1] += diff.count_diff
+
+            del before, after
+
+            # the second snapshot is gone by now, and the next phase starts afresh
+            tracemalloc.reset_peak()
+
+    def report(self, out: typing.TextIO = sys.stderr, limit: int = 5):
+
+        if not self.enabled:
+            return
+
+        print(
+            f"{'phase':<12} {'runs':>6} {'peak (MiB)':>11} {'growth (MiB)':>13} {'retained (MiB)':>15}",
+            file=out
+        )
+
+        for (name, s) in self._phases.items():
+            print(
+                f"{name:<12} {s.calls:>6} {s.peak / 2**20:>11.2f} {s.growth / 2**20:>13.2f} "
+                + f"{s.retained / 2**20:>15.2f}",
+                file=out
+            )
+
+        for (name, s) in self._phases.items():
+
+            sites: list[tuple[str, list[int]]] = sorted(
+                ((k, v) for (k, v) in s.sites.items() if v[0] > 0),
+                key=lambda kv: kv[1][0], reverse=True
+            )[:limit]
+
+            if not sites:
+                continue
+
+            print(f"\nretained by {name}:", file=out)
+            for (site, (size, blocks)) in sites:
+                print(f"  {size / 2**10:>12.1f} KiB {blocks:>10} blocks  {site}", file=out)
+
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
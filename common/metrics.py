@@ -0,0 +1,226 @@
+import bisect
+import http.server
+import os
+import threading
+import time
+import typing
+
+
+# upper bounds of the latency histogram, in seconds
+LATENCY_BUCKETS: tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+
+class Metrics:
+
+    # Counts the documents an entry point goes through, their bytes and
+    # tokens and the errors they raised by exception type, plus a histogram
+    # of how long each took, and renders them in Prometheus' text format.
+    # serve() answers GET /metrics from a thread of its own and
+    # dump_every() rewrites a file with the same text every few seconds, so
+    # that a batch can be watched with or without a scraper.
+    #
+    # record() is a few additions and a bisect under a lock the readers
+    # rarely hold, which is nothing next to parsing the document. The rates
+    # are averages since it was created, for whoever reads the file; a scraper
+    # should take rate() of the counters instead.
+    #
+    # A disabled Metrics records nothing and starts no threads.
+
+    enabled: bool
+
+    _exercise: str
+    _lock: threading.Lock
+
+    _started: float
+    _documents: int
+    _bytes: int
+    _tokens: int
+    _errors: dict[str, int]
+
+    # per bucket, not cumulative; the last one is +Inf
+    _latency_counts: list[int]
+    _latency_sum: float
+
+    _server: http.server.ThreadingHTTPServer
+    _stop: threading.Event
+    _dumper: threading.Thread
+    _dump_path: str
+
+    def __init__(self, exercise: str, enabled: bool = True):
+        self.enabled         = enabled
+
+        self._exercise       = exercise
+        self._lock           = threading.Lock()
+
+        self._started        = time.time()
+        self._documents      = 0
+        self._bytes          = 0
+        self._tokens         = 0
+        self._errors         = dict()
+
+        self._latency_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self._latency_sum    = 0.0
+
+        self._server         = None
+        self._stop           = threading.Event()
+        self._dumper         = None
+        self._dump_path      = None
+
+    # `tokens` only of the documents that parsed, `error` the name of the
+    # exception one that didn't raised
+    def record(self, size: int, seconds: float, tokens: int = 0, error: str = None):
+
+        if not self.enabled:
+            return
+
+        bucket: int = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+
+        with self._lock:
+            self._documents += 1
+            self._bytes     += size
+            self._tokens    += tokens
+
+            if error is not None:
+                self._errors[error] = self._errors.get(error, 0) + 1
+
+            self._latency_counts[bucket] += 1
+            self._latency_sum            += seconds
+
+    def render(self) -> str:
+
+        with self._lock:
+            (documents, size, tokens) = (self._documents, self._bytes, self._tokens)
+            errors: dict[str, int] = dict(self._errors)
+            counts: list[int] = list(self._latency_counts)
+            latency_sum: float = self._latency_sum
+
+        elapsed: float = max(time.time() - self._started, 1e-9)
+        label: str = f'exercise="{self._exercise}"'
+
+        lines: list[str] = list()
+
+        def metric(name: str, kind: str, text: str, samples: list[tuple[str, float]]):
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (labels, value) in samples:
+                lines.append(f"{name}{{{labels}}} {value}")
+
+        metric('eg_documents_total', 'counter', 'Documents parsed, failed ones included.',
+               [(label, documents)])
+        metric('eg_bytes_total', 'counter', 'UTF-8 bytes of the documents parsed.',
+               [(label, size)])
+        metric('eg_tokens_total', 'counter', 'Tokens of the documents that parsed.',
+               [(label, tokens)])
+        metric('eg_errors_total', 'counter', 'Documents that failed, by exception type.',
+               [(f'{label},type="{t}"', n) for (t, n) in sorted(errors.items())])
+
+        cumulative: int = 0
+        buckets: list[tuple[str, float]] = list()
+        for (bound, n) in zip([*map(str, LATENCY_BUCKETS), '+Inf'], counts):
+            cumulative += n
+            buckets.append((f'{label},le="{bound}"', cumulative))
+
+        metric('eg_parse_seconds', 'histogram', 'Time taken by each document.', [])
+        lines.extend(f"eg_parse_seconds_bucket{{{labels}}} {n}" for (labels, n) in buckets)
+        lines.append(f"eg_parse_seconds_sum{{{label}}} {latency_sum}")
+        lines.append(f"eg_parse_seconds_count{{{label}}} {cumulative}")
+
+        metric('eg_start_time_seconds', 'gauge', 'When counting began, in seconds since the epoch.',
+               [(label, self._started)])
+        metric('eg_documents_per_second', 'gauge', 'Documents per second since counting began.',
+               [(label, documents / elapsed)])
+        metric('eg_bytes_per_second', 'gauge', 'Bytes per second since counting began.',
+               [(label, size / elapsed)])
+        metric('eg_tokens_per_second', 'gauge', 'Tokens per second since counting began.',
+               [(label, tokens / elapsed)])
+
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port: int, host: str = '127.0.0.1'):
+
+        if not self.enabled:
+            return
+
+        metrics: Metrics = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+
+            def do_GET(self):
+
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+
+                body: bytes = metrics.render().encode()
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            # scrapes would fill stderr otherwise
+            def log_message(self, format: str, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def dump(self, path: str):
+
+        # written aside and renamed, so a reader never sees half a dump
+        tmp: str = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as fh:
+            fh.write(self.render())
+        os.replace(tmp, path)
+
+    def dump_every(self, path: str, interval: float):
+
+        if not self.enabled:
+            return
+
+        self._dump_path = path
+
+        def loop():
+            while not self._stop.wait(interval):
+                self.dump(path)
+
+        self._dumper = threading.Thread(target=loop, daemon=True)
+        self._dumper.start()
+
+    # stops serving and dumping, leaving the final counts in the file
+    def close(self):
+
+        if not self.enabled:
+            return
+
+        self._stop.set()
+
+        if self._dumper is not None:
+            self._dumper.join()
+            self.dump(self._dump_path)
+
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+# what entry points hold when no metrics were asked for
+NULL_METRICS: Metrics = Metrics('', enabled=False)
+
+
+def from_args(exercise: str, port: typing.Optional[int], path: typing.Optional[str],
+              interval: float) -> Metrics:
+
+    metrics: Metrics = Metrics(exercise, port is not None or path is not None)
+
+    if port is not None:
+        metrics.serve(port)
+    if path is not None:
+        metrics.dump_every(path, interval)
+
+    return metrics
@@ -0,0 +1,220 @@
+import contextlib
+import functools
+import lark
+import lark.visitors
+import sys
+import time
+import typing
+
+from memprofile import MemoryProfiler
+
+
+class _Stats:
+
+    __slots__ = ('calls', 'cumulative', 'own', 'active')
+
+    calls: int
+    cumulative: float
+    own: float
+
+    # calls of the method still running, so recursion isn't counted twice
+    active: int
+
+    def __init__(self):
+        self.calls      = 0
+        self.cumulative = 0.0
+        self.own        = 0.0
+        self.active     = 0
+
+
+class CallbackProfiler:
+
+    # Counts and times the rule and terminal callbacks of transformers and
+    # interpreters. instrument() wraps the methods of one instance, which has
+    # to happen before an LALR parser is built around it since lark binds the
+    # callbacks then. Self time leaves out the callbacks a method ran in turn
+    # (an Interpreter visiting its children); cumulative time counts each
+    # outermost call once. phase() times a stretch of the run, and the
+    # callback time spent inside it, so that e.g. an inline parse can be
+    # split between lark and the callbacks it calls.
+    #
+    # Without `names`, every public method the class adds is wrapped, which
+    # takes in helpers such as output_data; callback_names() narrows it down
+    # to the grammar's rules and terminals. The profiler isn't thread-safe,
+    # so methods other threads call must be left out.
+    #
+    # A disabled profiler instruments nothing and its phases are a shared
+    # null context, so leaving it in place costs nothing measurable.
+    #
+    # Given a MemoryProfiler, every phase is traced by it as well, from
+    # outside the timing so that the snapshots aren't counted as time.
+
+    enabled: bool
+    memory: MemoryProfiler
+
+    _stats: dict[str, _Stats]
+    _phases: dict[str, list[float]]
+
+    # time spent in outermost callbacks since the current phase began
+    _callback_time: float
+
+    # [start, time spent in nested callbacks] of every callback running
+    _stack: list[list[float]]
+
+    _NULL_CONTEXT: contextlib.nullcontext = contextlib.nullcontext()
+
+    def __init__(self, enabled: bool = True, memory: MemoryProfiler = None):
+        self.enabled        = enabled
+        self.memory         = memory
+
+        self._stats         = dict()
+        self._phases        = dict()
+        self._callback_time = 0.0
+
+        self._stack         = list()
+
+    def instrument(self, obj: typing.Any, names: typing.Iterable[str] = None) -> typing.Any:
+
+        if not self.enabled:
+            return obj
+
+        cls: type = type(obj)
+
+        if names is None:
+            # whatever the class adds to the lark visitor it derives from
+            inherited: set[str] = set(dir(lark.Transformer)) | set(dir(lark.visitors.Interpreter))
+            names = [
+                n for n in dir(cls)
+                if not n.startswith('_') and n not in inherited and callable(getattr(cls, n))
+            ]
+
+        for name in names:
+            if not callable(getattr(obj, name, None)):
+                continue
+            setattr(obj, name, self._wrap(f"{cls.__name__}.{name}", getattr(obj, name)))
+
+        return obj
+
+    def _wrap(self, key: str, f: typing.Callable) -> typing.Callable:
+
+        stats: _Stats = self._stats.setdefault(key, _Stats())
+        stack: list[list[float]] = self._stack
+        clock: typing.Callable[[], float] = time.perf_counter
+
+        # functools.wraps carries visit_wrapper (v_args) over to the wrapper
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+
+            frame: list[float] = [clock(), 0.0]
+            stack.append(frame)
+            stats.active += 1
+
+            try:
+                return f(*args, **kwargs)
+
+            finally:
+                elapsed: float = clock() - frame[0]
+                stack.pop()
+
+                stats.active -= 1
+                stats.calls  += 1
+                stats.own    += elapsed - frame[1]
+
+                if stats.active == 0:
+                    stats.cumulative += elapsed
+
+                if stack:
+                    stack[-1][1] += elapsed
+                else:
+                    self._callback_time += elapsed
+
+        return wrapper
+
+    def phase(self, name: str) -> typing.ContextManager:
+
+        if not self.enabled:
+            return self._NULL_CONTEXT if self.memory is None else self.memory.phase(name)
+
+        if self.memory is not None and self.memory.enabled:
+            return self._traced_phase(name)
+
+        return self._phase(name)
+
+    @contextlib.contextmanager
+    def _traced_phase(self, name: str):
+        with self.memory.phase(name), self._phase(name):
+            yield
+
+    @contextlib.contextmanager
+    def _phase(self, name: str):
+
+        outer_callbacks: float = self._callback_time
+        self._callback_time = 0.0
+
+        begin: float = time.perf_counter()
+
+        try:
+            yield
+
+        finally:
+            elapsed: float = time.perf_counter() - begin
+
+            totals: list[float] = self._phases.setdefault(name, [0.0, 0.0])
+            totals[0] += elapsed
+            totals[1] += self._callback_time
+
+            # a nested phase is part of its enclosing one
+            self._callback_time = outer_callbacks + self._callback_time
+
+    def report(self, out: typing.TextIO = sys.stderr, limit: int = None):
+
+        if self.memory is not None and self.memory.enabled:
+            self.memory.report(out)
+            if self.enabled:
+                print(file=out)
+
+        if not self.enabled:
+            return
+
+        if self._phases:
+            print(f"{'phase':<12} {'wall (s)':>10} {'callbacks (s)':>14} {'rest (s)':>10}", file=out)
+            for (name, (wall, callbacks)) in self._phases.items():
+                print(f"{name:<12} {wall:>10.4f} {callbacks:>14.4f} {wall - callbacks:>10.4f}", file=out)
+            print(file=out)
+
+        rows: list[tuple[str, _Stats]] = sorted(
+            ((k, s) for (k, s) in self._stats.items() if s.calls > 0),
+            key=lambda ks: ks[1].own, reverse=True
+        )[:limit]
+
+        total_own: float = sum(s.own for s in self._stats.values()) or 1.0
+
+        print(
+            f"{'callback':<36} {'calls':>10} {'cum (s)':>10} {'self (s)':>10} "
+            + f"{'self/call (us)':>15} {'self %':>7}",
+            file=out
+        )
+
+        for (key, s) in rows:
+            print(
+                f"{key:<36} {s.calls:>10} {s.cumulative:>10.4f} {s.own:>10.4f} "
+                + f"{s.own / s.calls * 1e6:>15.2f} {100 * s.own / total_own:>6.1f}%",
+                file=out
+            )
+
+
+# the rule and terminal names `parser` may call back, aliases included
+def callback_names(parser: lark.Lark) -> list[str]:
+
+    names: set[str] = {t.name for t in parser.terminals}
+
+    for r in parser.rules:
+        names.add(str(r.origin.name))
+        if r.alias is not None:
+            names.add(str(r.alias))
+
+    return sorted(n for n in names if not n.startswith('_'))
+
+
+# what entry points hold when --profile isn't given
+DISABLED: CallbackProfiler = CallbackProfiler(enabled=False)
@@ -0,0 +1,378 @@
+import lark
+import array
+import datetime
+import functools
+import heapq
+import io
+import typing
+
+
+# utility function
+def annotate(original: typing.Any, *ansi_escape_codes: int):
+
+    length: int = len(ansi_escape_codes)
+
+    if length == 0:
+        return str(original)
+
+    prefix: str = '\033[' + str(ansi_escape_codes[0])
+    for i in range(1, length):
+        prefix += ';' + str(ansi_escape_codes[i])
+
+    return prefix + 'm' + str(original) + '\033[0m'
+
+
+class SymbolTable:
+
+    __slots__ = ('_ids', '_names')
+
+    _ids: dict[str, int]
+    _names: list[str]
+
+    def __init__(self):
+        self._ids   = dict()
+        self._names = list()
+
+    def __len__(self):
+        return len(self._names)
+
+    def intern(self, name: str) -> int:
+
+        symbol: int = self._ids.get(name, -1)
+
+        if symbol == -1:
+            symbol = len(self._names)
+            self._ids[name] = symbol
+            self._names.append(name)
+
+        return symbol
+
+    # -1 for names never interned
+    def find(self, name: str) -> int:
+        return self._ids.get(name, -1)
+
+    def name(self, symbol: int) -> str:
+        return self._names[symbol]
+
+
+class ClassRecord:
+
+    __slots__ = ('class_id', 'students', 'grades', 'offsets', '_averages', '_buckets')
+
+    # symbols of the class and of its students, in input order
+    class_id: int
+    students: array.array
+
+    # grades of the i-th student are grades[offsets[i]:offsets[i + 1]]; a
+    # list instead once a grade doesn't fit in 64 bits
+    grades: typing.MutableSequence[int]
+    offsets: array.array
+
+    # worked out on first use
+    _averages: array.array
+    _buckets: list[tuple[int, array.array]]
+
+    def __init__(self, class_id: int):
+        self.class_id  = class_id
+        self.students  = array.array('I')
+        self.grades    = array.array('Q')
+        self.offsets   = array.array('Q', [0])
+        self._averages = None
+        self._buckets  = None
+
+    def __len__(self):
+        return len(self.students)
+
+    def add_student(self, student: int, grades: typing.Sequence[int]):
+
+        self.students.append(student)
+
+        # extend() keeps the grades before the one that overflowed
+        start: int = len(self.grades)
+        try:
+            self.grades.extend(grades)
+        except OverflowError:
+            self.grades = list(self.grades[:start])
+            self.grades.extend(grades)
+
+        self.offsets.append(len(self.grades))
+
+    def grades_of(self, i: int) -> typing.Sequence[int]:
+        return self.grades[self.offsets[i]:self.offsets[i + 1]]
+
+    def max_num_of_grades(self) -> int:
+        return max(self.offsets[i + 1] - self.offsets[i] for i in range(len(self)))
+
+    def averages(self) -> array.array:
+
+        if self._averages is None:
+            self._averages = array.array('d', (
+                sum(self.grades[self.offsets[i]:self.offsets[i + 1]])
+                / (self.offsets[i + 1] - self.offsets[i])
+                for i in range(len(self))
+            ))
+
+        return self._averages
+
+    # student symbols by grade, highest grade first
+    def grade_buckets(self) -> list[tuple[int, array.array]]:
+
+        if self._buckets is None:
+
+            grade_to_students: dict[int, array.array] = dict()
+
+            for i in range(len(self)):
+
+                student: int = self.students[i]
+
+                for g in self.grades[self.offsets[i]:self.offsets[i + 1]]:
+
+                    if g not in grade_to_students:
+                        grade_to_students[g] = array.array('I')
+
+                    bucket: array.array = grade_to_students[g]
+                    if len(bucket) == 0 or bucket[-1] != student:
+                        bucket.append(student)
+
+            self._buckets = sorted(grade_to_students.items(), key=lambda e: e[0], reverse=True)
+
+        return self._buckets
+
+
+class Roster:
+
+    # The aggregation both roster front-ends share: ClassTransformer feeds it
+    # token by token while lark transforms the tree, ClassInterpreter one
+    # class at a time while it visits it. Repeated classes, and students
+    # repeated within a class, raise lark.GrammarError.
+    #
+    # Names are interned and each class is a compact ClassRecord; averages,
+    # grade buckets, the top students, Markdown and SQL are only worked out
+    # when first asked for. Without keep_records the classes are validated
+    # and counted but not kept.
+
+    number_of_students: int
+    symbols: SymbolTable
+
+    _classes: list[ClassRecord]
+    _by_id: dict[int, ClassRecord]
+    _keep_records: bool
+
+    _curr_record: ClassRecord
+    _curr_students: set[int]
+
+    _top: dict[tuple[int, str], list[tuple[str, str, float]]]
+
+    def __init__(self, keep_records: bool = True):
+
+        self.number_of_students = 0
+        self.symbols            = SymbolTable()
+
+        self._classes           = list()
+        self._by_id             = dict()
+        self._keep_records      = keep_records
+
+        self._curr_record       = None
+        self._curr_students     = set()
+
+        self._top               = dict()
+
+    def begin_class(self, class_id: str) -> ClassRecord:
+
+        symbol: int = self.symbols.intern(class_id)
+        if symbol in self._by_id:
+            raise lark.GrammarError()
+
+        self._curr_record = ClassRecord(symbol)
+        return self._curr_record
+
+    def add_student(self, name: str, grades: typing.Sequence[int]):
+
+        symbol: int = self.symbols.intern(name)
+        if symbol in self._curr_students:
+            raise lark.GrammarError()
+
+        self._curr_students.add(symbol)
+        self.number_of_students += 1
+
+        self._curr_record.add_student(symbol, grades)
+
+    def end_class(self) -> ClassRecord:
+
+        record: ClassRecord = self._curr_record
+
+        self._by_id[record.class_id] = record if self._keep_records else None
+        if self._keep_records:
+            self._classes.append(record)
+
+        self._curr_record = None
+        self._curr_students.clear()
+
+        # what was memoized no longer covers every class
+        self.__dict__.pop('markdown', None)
+        self._top.clear()
+
+        return record
+
+    # forgets a class that failed half-way, so that the next one can follow
+    def discard_class(self):
+
+        if self._curr_record is not None:
+            self.number_of_students -= len(self._curr_record)
+
+        self._curr_record = None
+        self._curr_students.clear()
+
+    def add_class(self, class_id: str,
+                  students: typing.Iterable[tuple[str, typing.Sequence[int]]]) -> ClassRecord:
+
+        self.begin_class(class_id)
+
+        try:
+            for (name, grades) in students:
+                self.add_student(name, grades)
+        except lark.GrammarError:
+            self.discard_class()
+            raise
+
+        return self.end_class()
+
+    def class_count(self) -> int:
+        return len(self._classes)
+
+    def records(self, since: int = 0) -> list[ClassRecord]:
+        return self._classes[since:]
+
+    def class_ids(self) -> list[str]:
+        return [self.symbols.name(r.class_id) for r in self._classes]
+
+    def _record(self, class_id: str) -> ClassRecord:
+
+        record: ClassRecord = self._by_id.get(self.symbols.find(class_id))
+        if record is None:
+            raise KeyError(class_id)
+
+        return record
+
+    def grades(self, class_id: str) -> dict[str, array.array]:
+        record: ClassRecord = self._record(class_id)
+        return {self.symbols.name(s): record.grades_of(i) for (i, s) in enumerate(record.students)}
+
+    def averages(self, class_id: str) -> dict[str, float]:
+        record: ClassRecord = self._record(class_id)
+        return {self.symbols.name(s): avg for (s, avg) in zip(record.students, record.averages())}
+
+    def grade_buckets(self, class_id: str) -> list[tuple[int, set[str]]]:
+        return [
+            (grade, {self.symbols.name(s) for s in students})
+            for (grade, students) in self._record(class_id).grade_buckets()
+        ]
+
+    # the k best (name, class, average), of one class or of the whole roster
+    def top(self, k: int, class_id: str = None) -> list[tuple[str, str, float]]:
+
+        if (k, class_id) not in self._top:
+
+            records: list[ClassRecord] = self._classes if class_id is None else [self._record(class_id)]
+
+            best: list[tuple[float, int, int]] = heapq.nlargest(
+                k,
+                (
+                    (avg, r.class_id, s)
+                    for r in records
+                    for (s, avg) in zip(r.students, r.averages())
+                ),
+                key=lambda e: e[0]
+            )
+
+            self._top[(k, class_id)] = [
+                (self.symbols.name(s), self.symbols.name(c), avg) for (avg, c, s) in best
+            ]
+
+        return self._top[(k, class_id)]
+
+    def markdown_sections(self, since: int = 0) -> typing.Iterator[str]:
+
+        for record in self._classes[since:]:
+
+            students_class: str = self.symbols.name(record.class_id)
+
+            list_buffer: io.StringIO = io.StringIO()
+            list_buffer.write('### Lista de alunos\n')
+
+            table_buffer: io.StringIO = io.StringIO()
+            table_buffer.write('### Notas\n| Aluno | Media |\n|  --------  |  -------  |\n')
+
+            for (symbol, avg) in zip(record.students, record.averages()):
+                student: str = self.symbols.name(symbol)
+                list_buffer.write(f"- {student}\n")
+                table_buffer.write(f"| {student} | {'%.2f' % avg} |\n")
+
+            yield (
+                f"## Turma {students_class}\n"
+                + list_buffer.getvalue() + '\n'
+                + table_buffer.getvalue() + '\n'
+            )
+
+    @functools.cached_property
+    def markdown(self) -> str:
+        return '# Visualizador de turmas\n' + ''.join(self.markdown_sections())
+
+    # (StudentName, Grade, Date, Class) for every student
+    def sql_rows(self, since: int = 0) -> typing.Iterator[tuple[str, str, str, str]]:
+
+        today: str = str(datetime.date.today())
+
+        for record in self._classes[since:]:
+
+            class_id: str = self.symbols.name(record.class_id)
+
+            for (student, avg) in zip(record.students, record.averages()):
+                yield (self.symbols.name(student), '%.2f' % avg, today, class_id)
+
+    def sql_queries(self, since: int = 0) -> typing.Iterator[str]:
+        for (name, avg, date, class_id) in self.sql_rows(since):
+            yield (f"{annotate('INSERT INTO', 36, 1)} {annotate('Resultado', 33, 1)} "
+                   + f"(StudentName, Grade, Date, Class) {annotate('VALUES', 36, 1)} "
+                   + f"('{name}', '{avg}', '{date}', '{class_id}');"
+                   )
+
+    # the report both exercises print, covering the classes from `since` on;
+    # classes.md is rewritten from scratch unless `since` says to append
+    def output_data(self, since: int = 0):
+
+        print(f"Number of students: {annotate(self.number_of_students, 1)}")
+
+        for record in self._classes[since:]:
+
+            students_class: str = self.symbols.name(record.class_id)
+
+            for (symbol, avg) in zip(record.students, record.averages()):
+                print(
+                    f"Average grade for student {annotate(self.symbols.name(symbol), 1)} "
+                    + f"of class {annotate(students_class, 1)}: "
+                    + f"{annotate('%.2f' % avg, 1, (32 if avg >= 9.5 else 31))}"
+                )
+
+        with open('classes.md', 'w' if since == 0 else 'a') as md_file_handle:
+
+            if since == 0:
+                md_file_handle.write(self.markdown)
+            else:
+                md_file_handle.writelines(self.markdown_sections(since))
+
+        for record in self._classes[since:]:
+
+            students_class: str = self.symbols.name(record.class_id)
+
+            for (grade, students) in record.grade_buckets():
+
+                students_set: set[str] = {self.symbols.name(s) for s in students}
+
+                print(
+                    f"Students of class {annotate(students_class, 1)} that scored "
+                    + f"{annotate(grade, 1)}: {annotate(students_set, 1)}"
+                )
+
+        for q in self.sql_queries(since):
+            print(q)
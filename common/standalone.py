@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import argparse
+import hashlib
+import importlib
+import os
+import py_compile
+import sys
+import types
+
+import lark
+import lark.tools.standalone
+
+
+# Lark's standalone generator writes an LALR parser into a module of its
+# own: the parse tables, already worked out from the grammar, and the part
+# of the runtime that runs them, none of which imports lark. Such a module
+# is built from the grammar an exercise defines (`make standalone` in its
+# directory), and the exercise uses it in place of lark.Lark(...) when it
+# is there. A module built from an older grammar is left alone, so editing
+# the grammar without rebuilding only costs the speed-up.
+#
+# Its Lark_StandAlone takes the same transformer an LALR lark.Lark would,
+# but raises its own copies of lark's exceptions; syntax_errors() is what
+# an entry point catches to cover both.
+
+def digest(grammar: str, start: str = 'start') -> str:
+    return hashlib.sha256(f"{start}\0{grammar}".encode()).hexdigest()
+
+
+def generate(grammar: str, path: str, start: str = 'start'):
+
+    parser: lark.Lark = lark.Lark(grammar, parser='lalr', lexer='contextual', start=start)
+
+    # written aside and renamed, so an interrupted build leaves nothing to import
+    tmp: str = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as fh:
+        lark.tools.standalone.gen_standalone(parser, out=fh)
+        fh.write(f"\nGRAMMAR_DIGEST = {digest(grammar, start)!r}\n")
+    os.replace(tmp, path)
+
+    # compiled now rather than on every import where bytecode isn't written,
+    # the tables being most of what there is to compile
+    py_compile.compile(path, doraise=True)
+
+
+# the generated module, or None when it hasn't been built or is out of date
+def load(name: str, grammar: str, start: str = 'start') -> types.ModuleType:
+
+    try:
+        module: types.ModuleType = importlib.import_module(name)
+    except ImportError:
+        return None
+
+    if getattr(module, 'GRAMMAR_DIGEST', None) != digest(grammar, start):
+        print(f"{name} is out of date with its grammar, ignoring it", file=sys.stderr)
+        return None
+
+    return module
+
+
+def syntax_errors(module: types.ModuleType) -> tuple[type, ...]:
+
+    if module is None:
+        return (lark.UnexpectedInput,)
+
+    return (lark.UnexpectedInput, module.UnexpectedInput)
+
+
+def main():
+
+    argp: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="generate a standalone LALR parser from an exercise's grammar"
+    )
+    argp.add_argument('module', help='module of the current directory that defines `grammar`')
+    argp.add_argument('output', help='the module to write')
+    argp.add_argument('--start', default='start', help='start rule (default: %(default)s)')
+    args: argparse.Namespace = argp.parse_args()
+
+    # so that importing the exercise doesn't load the module being replaced
+    if os.path.exists(args.output):
+        os.remove(args.output)
+
+    sys.path.insert(0, os.getcwd())
+    grammar: str = importlib.import_module(args.module).grammar
+
+    generate(grammar, args.output, args.start)
+
+
+if __name__ == '__main__':
+    main()
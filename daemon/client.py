@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import socket
+import sys
+
+import protocol
+
+
+# Sends documents to a running parserd and prints what came back, so that
+# using it costs no more than starting a bare interpreter: nothing here
+# imports lark or ply. The files a job writes (classes.md, classes.html)
+# are written here, where the exercise itself would have left them.
+
+def main():
+
+    argp: argparse.ArgumentParser = argparse.ArgumentParser(
+        description='run an exercise on documents through parserd'
+    )
+    argp.add_argument('job', choices=('intervals', 'lists', 'roster', 'interpreter', 'album'),
+                      help='ex1, ex2, ex3, ex4 or ex5 in that order')
+    argp.add_argument('files', nargs='*', help='documents to send (default: stdin)')
+    argp.add_argument('--socket', default=protocol.default_socket(), metavar='PATH',
+                      help='where parserd listens (default: %(default)s)')
+    argp.add_argument('--inline', action='store_true',
+                      help='roster and album: parse with LALR and build no tree')
+    argp.add_argument('--iterative', action='store_true',
+                      help='interpreter: visit with an explicit stack')
+    argp.add_argument('--output', default='.', metavar='DIR',
+                      help='where to write the files a job produces')
+    args: argparse.Namespace = argp.parse_args()
+
+    options: dict = dict()
+    if args.inline:
+        options['inline'] = True
+    if args.iterative:
+        options['iterative'] = True
+
+    documents: list[tuple[str, str]] = list()
+    if args.files:
+        for fn in args.files:
+            with open(fn) as fh:
+                documents.append((fn, fh.read()))
+    else:
+        documents.append(('<stdin>', sys.stdin.read()))
+
+    failed: bool = False
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+
+        try:
+            sock.connect(args.socket)
+        except (ConnectionRefusedError, FileNotFoundError):
+            sys.exit(f"no parserd listening on {args.socket}")
+
+        for (fn, text) in documents:
+
+            protocol.send_message(sock, {'job': args.job, 'text': text, 'options': options})
+            result: dict = protocol.receive_message(sock)
+
+            if result is None:
+                sys.exit('parserd closed the connection')
+
+            sys.stdout.write(result.get('stdout', ''))
+            sys.stderr.write(result.get('stderr', ''))
+
+            for (name, contents) in result.get('files', dict()).items():
+                with open(os.path.join(args.output, name), 'w') as fh:
+                    fh.write(contents)
+
+            if not result['ok']:
+                failed = True
+                print(f"{fn}: {result.get('error') or 'failed'}", file=sys.stderr)
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import concurrent.futures
+import itertools
+import json
+import os
+import stat
+import sys
+import threading
+import typing
+
+import jobs
+
+
+# Reads records, one per line, from several files and pipes at once and
+# has the intervals (ex1) or lists (ex2) parser run over each in a pool of
+# worker processes, printing every result as soon as it is back, tagged
+# with where the record came from: "source:line: ...".
+#
+# Each source is read by a task of its own, which gathers the lines that
+# are already there into a batch and puts it on a bounded queue, so that a
+# worker gets many records a round trip. When the workers fall behind, the
+# queue fills up and the readers stop reading, and the producers writing
+# into the pipes get blocked in turn; a batch from a slow pipe is sent once
+# no line has arrived for --linger seconds, not held until it fills up.
+# Blank lines are skipped, but still counted.
+
+JOB_OF: dict[str, str] = {'ex1': 'intervals', 'ex2': 'lists'}
+
+# (source, line number, record), the record None when it was too long
+Record = tuple[str, int, typing.Optional[str]]
+
+
+# Opening a FIFO waits until something opens it to write, so it is done in
+# a thread of its own, not to keep the other sources waiting. The thread is
+# a daemon, and left behind: one waiting for a writer that never comes
+# would otherwise keep the pool of asyncio.to_thread, and so the process,
+# from ever shutting down, even on ^C.
+async def _open(path: str) -> typing.BinaryIO:
+
+    loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+    opened: asyncio.Future = loop.create_future()
+
+    def settle(fh: typing.BinaryIO, error: OSError):
+        if opened.cancelled():
+            if fh is not None:
+                fh.close()
+        elif error is not None:
+            opened.set_exception(error)
+        else:
+            opened.set_result(fh)
+
+    def opener():
+
+        (fh, error) = (None, None)
+        try:
+            fh = open(path, 'rb')
+        except OSError as e:
+            error = e
+
+        # the loop may be gone by the time a writer turns up
+        try:
+            loop.call_soon_threadsafe(settle, fh, error)
+        except RuntimeError:
+            if fh is not None:
+                fh.close()
+
+    threading.Thread(target=opener, daemon=True).start()
+
+    return await opened
+
+
+# None in a batch stands for a line longer than `limit`, which is skipped
+async def _pipe_batches(fh: typing.BinaryIO, size: int, linger: float,
+                        limit: int) -> typing.AsyncIterator[list[bytes]]:
+
+    loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+
+    reader: asyncio.StreamReader = asyncio.StreamReader(limit=limit)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), fh)
+
+    batch: list[bytes] = list()
+    skipping: bool = False
+
+    while True:
+
+        eof: bool = False
+
+        # a readuntil that times out leaves what it had read in the reader
+        try:
+            if batch:
+                line: bytes = await asyncio.wait_for(reader.readuntil(), linger)
+            else:
+                line: bytes = await reader.readuntil()
+
+        except asyncio.TimeoutError:
+            yield batch
+            batch = list()
+            continue
+
+        # what the reader holds of the line goes now, the rest as it arrives
+        except asyncio.LimitOverrunError as e:
+            await reader.readexactly(e.consumed)
+            skipping = True
+            continue
+
+        # the last line, if it has no "\n"
+        except asyncio.IncompleteReadError as e:
+            (line, eof) = (e.partial, True)
+
+        if skipping:
+            batch.append(None)
+            skipping = False
+        elif line:
+            batch.append(line)
+
+        if eof:
+            break
+
+        if len(batch) >= size:
+            yield batch
+            batch = list()
+
+    if batch:
+        yield batch
+
+
+# regular files never keep a reader waiting, so they are read in batches
+# as they come, in a thread so as not to hold up the other sources
+async def _file_batches(fh: typing.BinaryIO, size: int) -> typing.AsyncIterator[list[bytes]]:
+
+    while True:
+        batch: list[bytes] = await asyncio.to_thread(lambda: list(itertools.islice(fh, size)))
+        if not batch:
+            return
+        yield batch
+
+
+class Ingest:
+
+    _job: str
+    _pool: concurrent.futures.ProcessPoolExecutor
+    _queue: asyncio.Queue
+    _json: bool
+
+    _batch: int
+    _linger: float
+    _limit: int
+
+    failed: int
+
+    def __init__(self, job: str, pool: concurrent.futures.ProcessPoolExecutor, depth: int,
+                 batch: int, linger: float, limit: int, as_json: bool = False):
+        self._job    = job
+        self._pool   = pool
+        self._queue  = asyncio.Queue(depth)
+        self._json   = as_json
+
+        self._batch  = batch
+        self._linger = linger
+        self._limit  = limit
+
+        self.failed  = 0
+
+    async def read(self, source: str):
+
+        try:
+            fh: typing.BinaryIO = sys.stdin.buffer if source == '-' else await _open(source)
+        except OSError as e:
+            self._emit_failure(source, 0, e.strerror)
+            return
+
+        with fh:
+
+            if stat.S_ISREG(os.fstat(fh.fileno()).st_mode):
+                batches: typing.AsyncIterator[list[bytes]] = _file_batches(fh, self._batch)
+            else:
+                batches = _pipe_batches(fh, self._batch, self._linger, self._limit)
+
+            number: int = 0
+
+            async for batch in batches:
+
+                records: list[Record] = list()
+
+                for line in batch:
+                    number += 1
+                    if line is None:
+                        records.append((source, number, None))
+                    elif line.strip():
+                        records.append((source, number, line.decode(errors='replace')))
+
+                if records:
+                    await self._queue.put(records)
+
+    async def parse(self):
+
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+
+        while True:
+
+            records: list[Record] = await self._queue.get()
+            texts: list[str] = [text for (_, _, text) in records if text is not None]
+
+            try:
+                results: list[jobs.Result] = await loop.run_in_executor(
+                    self._pool, jobs.run_many, self._job, texts, dict()
+                )
+
+            # a worker that died, or a bug in the job; the batch fails and
+            # the rest carry on
+            except Exception as e:
+                results = [
+                    {'ok': False, 'error': f"{type(e).__name__}: {e}", 'stdout': '', 'stderr': ''}
+                ] * len(texts)
+
+            answers: typing.Iterator[jobs.Result] = iter(results)
+
+            for (source, number, text) in records:
+                if text is None:
+                    self._emit_failure(source, number, f"record over {self._limit} bytes")
+                else:
+                    self._emit(source, number, next(answers))
+
+            self._queue.task_done()
+
+    # returns once every record read so far has been emitted
+    async def drain(self):
+        await self._queue.join()
+
+    def _emit(self, source: str, number: int, result: jobs.Result):
+
+        if not result['ok']:
+            self.failed += 1
+
+        if self._json:
+            print(json.dumps({
+                'source': source, 'record': number, 'ok': result['ok'], 'error': result['error'],
+                'stdout': result['stdout'], 'stderr': result['stderr'],
+            }), flush=True)
+            return
+
+        for line in result['stdout'].splitlines():
+            print(f"{source}:{number}: {line}")
+        for line in result['stderr'].splitlines():
+            print(f"{source}:{number}: {line}", file=sys.stderr)
+
+        if not result['ok']:
+            print(f"{source}:{number}: {result['error'] or 'failed'}", file=sys.stderr)
+
+        sys.stdout.flush()
+
+    def _emit_failure(self, source: str, number: int, error: str):
+        self._emit(source, number, {'ok': False, 'error': error, 'stdout': '', 'stderr': ''})
+
+
+async def ingest(args: argparse.Namespace) -> int:
+
+    with concurrent.futures.ProcessPoolExecutor(args.jobs, initializer=jobs.preload) as pool:
+
+        front: Ingest = Ingest(JOB_OF[args.exercise], pool, args.depth, args.batch,
+                               args.linger, args.max_record, args.json)
+
+        # two batches a worker, so that each has the next one at hand
+        parsers: list[asyncio.Task] = [
+            asyncio.create_task(front.parse()) for _ in range(2 * args.jobs)
+        ]
+
+        async def read_all():
+            await asyncio.gather(*(front.read(source) for source in args.sources or ['-']))
+            await front.drain()
+
+        reading: asyncio.Task = asyncio.create_task(read_all())
+
+        # a parser only stops by raising, when a result couldn't be printed
+        await asyncio.wait([reading, *parsers], return_when=asyncio.FIRST_COMPLETED)
+
+        for task in [reading, *parsers]:
+            task.cancel()
+
+        for task in parsers:
+            if task.done() and not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+
+    return 1 if front.failed > 0 else 0
+
+
+def main():
+
+    argp: argparse.ArgumentParser = argparse.ArgumentParser(
+        description='parse the records of several files and pipes at once, one per line'
+    )
+    argp.add_argument('exercise', choices=JOB_OF, help='the parser to run over each record')
+    argp.add_argument('sources', nargs='*', help='files or FIFOs to read, - for stdin (default)')
+    argp.add_argument('--jobs', type=int, default=os.cpu_count(),
+                      help='worker processes (default: one per core)')
+    argp.add_argument('--depth', type=int, default=16,
+                      help='batches allowed to wait for a worker before reading stops')
+    argp.add_argument('--batch', type=int, default=64,
+                      help='records handed to a worker at a time, at most')
+    argp.add_argument('--linger', type=float, default=0.005, metavar='SECONDS',
+                      help='how long a pipe may keep a partial batch waiting for more')
+    argp.add_argument('--max-record', type=int, default=2**24, metavar='BYTES',
+                      help='longest line read from a pipe (default: 16 MiB)')
+    argp.add_argument('--json', action='store_true',
+                      help='print a JSON object per record instead of tagged lines')
+    args: argparse.Namespace = argp.parse_intermixed_args()
+
+    if args.jobs < 1:
+        argp.error('--jobs must be at least 1')
+    if args.batch < 1:
+        argp.error('--batch must be at least 1')
+
+    # a queue of size 0 would have no bound at all
+    if args.depth < 1:
+        argp.error('--depth must be at least 1')
+
+    try:
+        sys.exit(asyncio.run(ingest(args)))
+
+    except KeyboardInterrupt:
+        sys.exit(130)
+
+    # stdout closed early, as by `| head`; what is still buffered has nowhere to go
+    except BrokenPipeError:
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
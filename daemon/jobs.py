@@ -0,0 +1,207 @@
+import contextlib
+import io
+import multiprocessing.synchronize
+import os
+import sys
+import tempfile
+import typing
+
+ROOT: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+for ex in ('ex5', 'ex4', 'ex3', 'ex2', 'ex1'):
+    sys.path.insert(0, os.path.join(ROOT, ex))
+
+import lark
+import ply.yacc
+
+import intervalos_lex
+import intervalos_yacc
+import lists_exercise3
+import students_exercise
+import interpreter
+import albums
+
+
+# What the daemon's workers run. preload() builds every grammar once per
+# worker process and each job then reuses them, so a request costs the parse
+# and the rendering and nothing else. A job runs the exercise's own code in
+# an empty scratch directory with stdout and stderr captured, and hands back
+# what it printed and the files it left there (classes.md, classes.html).
+
+Result = dict[str, typing.Any]
+
+_ply_parser = None
+_lists_parser: lark.Lark = None
+_roster_tree: students_exercise.RosterParser = None
+_roster_transformer: students_exercise.ClassTransformer = None
+_roster_inline: lark.Lark = None
+_interpreter_parser: lark.Lark = None
+_album_parser: lark.Lark = None
+_album_emitter: albums.AlbumEmitter = None
+_album_inline: lark.Lark = None
+
+# shared by every worker of a pool, for ping(warm_up=True)
+_warm_up: multiprocessing.synchronize.Barrier = None
+
+
+def preload(warm_up: multiprocessing.synchronize.Barrier = None):
+
+    global _ply_parser, _lists_parser, _roster_tree, _roster_transformer, _roster_inline
+    global _interpreter_parser
+    global _album_parser, _album_emitter, _album_inline
+    global _warm_up
+
+    _warm_up = warm_up
+
+    # write_tables and debug off, or yacc leaves parsetab.py and parser.out behind
+    _ply_parser = ply.yacc.yacc(module=intervalos_yacc, write_tables=False, debug=False)
+    intervalos_yacc.parser = _ply_parser
+
+    # the lists grammar is LALR-able, and LALR builds the trees Earley does
+    # at a fraction of the cost, which is what ingest's batches are made of
+    _lists_parser       = lark.Lark(lists_exercise3.grammar, parser='lalr')
+    _roster_tree        = students_exercise.tree_parser(lark.Lark(students_exercise.grammar))
+    _roster_transformer = students_exercise.ClassTransformer()
+    _roster_inline      = lark.Lark(
+        students_exercise.grammar, parser='lalr', transformer=_roster_transformer
+    )
+    _interpreter_parser = lark.Lark(interpreter.grammar)
+    _album_parser       = lark.Lark(albums.grammar, start='album')
+    _album_emitter      = albums.AlbumEmitter()
+    _album_inline       = albums.inline_parser(_album_emitter)
+
+
+# Jobs that write no files (ex1, ex2) are run where they are, without the
+# scratch directory, which is a good part of what a line of ex1 costs.
+@contextlib.contextmanager
+def _captured(scratch: bool = True) -> typing.Iterator[Result]:
+
+    result: Result = {'ok': True, 'error': None, 'stdout': '', 'stderr': '', 'files': dict()}
+    (out, err) = (io.StringIO(), io.StringIO())
+    cwd: str = os.getcwd()
+
+    directory: contextlib.AbstractContextManager = (
+        tempfile.TemporaryDirectory(prefix='eg-parserd-') if scratch else contextlib.nullcontext()
+    )
+
+    with directory as path:
+
+        if path is not None:
+            os.chdir(path)
+
+        try:
+            with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+                yield result
+
+        # the inline album parser may be the standalone one, with exceptions of its own
+        except (*albums.SYNTAX_ERRORS, lark.GrammarError) as e:
+            result['ok']    = False
+            result['error'] = f"{type(e).__name__}: {e}"
+
+        finally:
+            result['stdout'] = out.getvalue()
+            result['stderr'] = err.getvalue()
+
+            if path is not None:
+                os.chdir(cwd)
+
+                for fn in sorted(os.listdir(path)):
+                    with open(os.path.join(path, fn)) as fh:
+                        result['files'][fn] = fh.read()
+
+
+# ex1: every line is a sequence of intervals of its own
+def intervals(text: str) -> Result:
+
+    with _captured(scratch=False) as result:
+
+        for line in text.splitlines(keepends=True):
+
+            intervalos_yacc.start_line(line)
+            _ply_parser.parse(line, intervalos_lex.lexer)
+
+            if not _ply_parser.success:
+                result['ok'] = False
+
+    return result
+
+
+# ex2
+def lists(text: str) -> Result:
+
+    with _captured(scratch=False) as result:
+        lists_exercise3.ListTransformer().transform(_lists_parser.parse(text))
+
+    return result
+
+
+# ex3: classes.md and classes.html come back among the files
+def roster(text: str, inline: bool = False) -> Result:
+
+    with _captured() as result:
+        with students_exercise.HtmlTableWriter() as htw:
+
+            ct: students_exercise.ClassTransformer = _roster_transformer
+            if inline:
+                ct.begin(htw)
+                _roster_inline.parse(text)
+            else:
+                ct = _roster_tree(text, htw)
+
+            ct.output_data()
+
+    return result
+
+
+# ex4
+def roster_interpreter(text: str, iterative: bool = False) -> Result:
+
+    with _captured() as result:
+        ci: interpreter.ClassInterpreter = (
+            interpreter.IterativeClassInterpreter() if iterative else interpreter.ClassInterpreter()
+        )
+        ci.visit(_interpreter_parser.parse(text))
+        ci.output_data()
+
+    return result
+
+
+# ex5: the LaTeX comes back as stdout
+def album(text: str, inline: bool = False) -> Result:
+
+    with _captured() as result:
+        if inline:
+            _album_emitter.begin(sys.stdout)
+            _album_inline.parse(text)
+        else:
+            albums.AlbumInterpreter(sys.stdout).visit(_album_parser.parse(text))
+
+    return result
+
+
+JOBS: dict[str, typing.Callable[..., Result]] = {
+    'intervals':   intervals,
+    'lists':       lists,
+    'roster':      roster,
+    'interpreter': roster_interpreter,
+    'album':       album,
+}
+
+
+def run(job: str, text: str, options: dict[str, typing.Any]) -> Result:
+    return JOBS[job](text, **options)
+
+
+# many small documents in a single round trip to the worker
+def run_many(job: str, texts: list[str], options: dict[str, typing.Any]) -> list[Result]:
+    return [JOBS[job](text, **options) for text in texts]
+
+
+# answered by a worker, so that the pool is known to be up and warm; with
+# warm_up, the worker holds on to the ping until every worker of the pool
+# has one, so that as many pings as workers reach each one of them
+def ping(warm_up: bool = False) -> Result:
+
+    if warm_up:
+        _warm_up.wait()
+
+    return {'ok': True, 'pid': os.getpid()}
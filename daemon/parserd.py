@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+import argparse
+import concurrent.futures
+import multiprocessing
+import os
+import signal
+import socket
+import socketserver
+import sys
+
+import jobs
+import protocol
+
+
+# Keeps a pool of worker processes with every grammar already built (see
+# jobs.preload) and runs the jobs sent to it over a Unix domain socket.
+# Each connection gets a thread of its own, which hands the requests read
+# from it to the pool one at a time, so requests on different connections
+# run side by side on as many workers as there are.
+
+class RequestHandler(socketserver.BaseRequestHandler):
+
+    server: 'ParserServer'
+
+    def handle(self):
+
+        while True:
+
+            try:
+                request: dict = protocol.receive_message(self.request)
+            except (ConnectionError, ValueError) as e:
+                print(f"parserd: dropping a client: {e}", file=sys.stderr)
+                return
+
+            if request is None:
+                return
+
+            protocol.send_message(self.request, self.server.answer(request))
+
+
+class ParserServer(socketserver.ThreadingUnixStreamServer):
+
+    daemon_threads = True
+
+    pool: concurrent.futures.ProcessPoolExecutor
+
+    def __init__(self, path: str, pool: concurrent.futures.ProcessPoolExecutor):
+        self.pool = pool
+
+        # only the user running the daemon may connect to it
+        umask: int = os.umask(0o177)
+        try:
+            super().__init__(path, RequestHandler)
+        finally:
+            os.umask(umask)
+
+    def answer(self, request: dict) -> dict:
+
+        job: str = request.get('job')
+
+        if job == 'ping':
+            return self.pool.submit(jobs.ping).result()
+
+        if job not in jobs.JOBS:
+            return {'ok': False, 'error': f"unknown job {job!r}, not one of {', '.join(jobs.JOBS)}"}
+
+        try:
+            return self.pool.submit(
+                jobs.run, job, request.get('text', ''), request.get('options') or dict()
+            ).result()
+
+        # a bad option, or a bug in a job; the worker and the daemon carry on
+        except Exception as e:
+            return {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+
+
+def remove_stale_socket(path: str):
+
+    if not os.path.exists(path):
+        return
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.remove(path)
+            return
+
+    sys.exit(f"parserd: a daemon is already listening on {path}")
+
+
+def main():
+
+    argp: argparse.ArgumentParser = argparse.ArgumentParser(
+        description='keep the parsers of every exercise loaded and run jobs sent over a Unix socket'
+    )
+    argp.add_argument('--socket', default=protocol.default_socket(), metavar='PATH',
+                      help='where to listen (default: %(default)s)')
+    argp.add_argument('--jobs', type=int, default=os.cpu_count(),
+                      help='worker processes (default: one per core)')
+    args: argparse.Namespace = argp.parse_args()
+
+    remove_stale_socket(args.socket)
+
+    warm_up: multiprocessing.synchronize.Barrier = multiprocessing.Barrier(args.jobs)
+
+    with concurrent.futures.ProcessPoolExecutor(
+        args.jobs, initializer=jobs.preload, initargs=(warm_up,)
+    ) as pool:
+
+        # the pool only starts its workers as jobs come in, so they are all
+        # started, and their grammars built, before the first client connects;
+        # the pings wait for each other, so no worker can answer two of them
+        pings: list[concurrent.futures.Future] = [
+            pool.submit(jobs.ping, True) for _ in range(args.jobs)
+        ]
+        pids: set[int] = {f.result()['pid'] for f in pings}
+
+        server: ParserServer = ParserServer(args.socket, pool)
+
+        # SIGTERM leaves through the same cleanup as ^C
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+        print(f"parserd: {len(pids)} workers ready on {args.socket}", file=sys.stderr)
+
+        try:
+            server.serve_forever()
+
+        except KeyboardInterrupt:
+            pass
+
+        finally:
+            server.server_close()
+            os.remove(args.socket)
+            pool.shutdown(cancel_futures=True)
+
+
+if __name__ == '__main__':
+    main()
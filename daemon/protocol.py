@@ -0,0 +1,61 @@
+import json
+import os
+import socket
+import struct
+
+
+# Every message is a JSON object preceded by its UTF-8 length, as a 4 byte
+# big-endian unsigned integer. A request names a job from jobs.JOBS, the
+# document to run it over and the job's options:
+#
+#   {"job": "roster", "text": "TURMA A ...", "options": {"inline": true}}
+#
+# and is answered with what the job printed and the files it wrote, or
+# with "ok" false and an "error" when it failed.
+
+_HEADER: struct.Struct = struct.Struct('!I')
+
+# enough for any album or roster we have; a bigger length means the peer
+# isn't speaking this protocol
+MAX_MESSAGE: int = 256 * 2**20
+
+
+def default_socket() -> str:
+    directory: str = os.environ.get('XDG_RUNTIME_DIR') or '/tmp'
+    return os.path.join(directory, f"eg-parserd-{os.getuid()}.sock")
+
+
+def _receive_exactly(sock: socket.socket, size: int) -> bytes:
+
+    chunks: list[bytes] = list()
+
+    while size > 0:
+        chunk: bytes = sock.recv(min(size, 2**20))
+        if not chunk:
+            raise ConnectionError('connection closed in the middle of a message')
+        chunks.append(chunk)
+        size -= len(chunk)
+
+    return b''.join(chunks)
+
+
+def send_message(sock: socket.socket, message: dict):
+    data: bytes = json.dumps(message).encode()
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+# None once the peer has closed the connection between two messages
+def receive_message(sock: socket.socket) -> dict:
+
+    header: bytes = sock.recv(_HEADER.size, socket.MSG_WAITALL)
+
+    if not header:
+        return None
+    if len(header) < _HEADER.size:
+        header += _receive_exactly(sock, _HEADER.size - len(header))
+
+    (size,) = _HEADER.unpack(header)
+    if size > MAX_MESSAGE:
+        raise ValueError(f"message of {size} bytes is over the limit of {MAX_MESSAGE}")
+
+    return json.loads(_receive_exactly(sock, size))
@@ -25,9 +25,13 @@ def t_newline(t):
 t_ignore = ' \t'
 
 
-# Error handling rule
+# Error handling rule; kept with the parser's errors when validating
 def t_error(t):
-    print("Illegal character '%s'" % t.value[0])
+    errors = getattr(t.lexer, 'errors', None)
+    if errors is None:
+        print("Illegal character '%s'" % t.value[0])
+    else:
+        errors.append((t.lexpos, "illegal character '%s'" % t.value[0]))
     t.lexer.skip(1)
 
 
@@ -1,9 +1,17 @@
 #!/usr/bin/env python3
 
 import sys
+import os
+import argparse
+import time
 import functools
 import ply.yacc
-from intervalos_lex import tokens
+from intervalos_lex import tokens, lexer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'common'))
+
+from memprofile import MemoryProfiler
+from metrics import Metrics, from_args
 
 
 parser = None
@@ -53,43 +61,42 @@ def print_statistics(l: list[tuple[int, int]]):
     print()
 
 
-# The set of syntatic rules
-def p_sequencia(p):
-    "sequencia : sentido intervalos"
+# Reports an error found by an action. Normally it is printed and the line
+# given up on; in --validate mode it is kept, along with where it starts,
+# and the action carries on so that the rest of the line is checked too.
+def syntax_error(lexpos: int, message: str):
 
-    p[0] = p[2]
-
-    for i in range(0, len(p[0]) - 1):
-
-        if parser.is_plus:
+    parser.success = False
 
-            if p[0][i][1] >= p[0][i + 1][0]:
+    if parser.errors is None:
+        print(f"Syntax error: {message}", file=sys.stderr)
+        raise SyntaxError
 
-                parser.success = False
+    parser.errors.append((lexpos, message))
 
-                print(
-                    f"Syntax error: intervals {p[0][i]} and {p[0][i+1]} "
-                    + "aren't in the correct order or intercept",
-                    file=sys.stderr
-                )
 
-                raise SyntaxError
+# The set of syntatic rules
+def p_sequencia(p):
+    "sequencia : sentido intervalos"
 
-        else:
+    p[0] = p[2]
 
-            if p[0][i][1] <= p[0][i + 1][0]:
+    # an interval that went wrong has already given up on the line
+    if parser.errors is None and not parser.success:
+        return
 
-                parser.success = False
+    # intervals with errors of their own are None, and left out of the order
+    checked: list[tuple[int, tuple[int, int]]] = [
+        (lexpos, i) for (lexpos, i) in zip(parser.positions, p[0]) if i is not None
+    ]
 
-                print(
-                    f"Syntax error: intervals {p[0][i]} and {p[0][i+1]} "
-                    + "aren't in the correct order or intercept",
-                    file=sys.stderr
-                )
+    for ((_, a), (lexpos, b)) in zip(checked, checked[1:]):
 
-                raise SyntaxError
+        if (a[1] >= b[0]) if parser.is_plus else (a[1] <= b[0]):
+            syntax_error(lexpos, f"intervals {a} and {b} aren't in the correct order or intercept")
 
-    print_statistics(p[0])
+    if parser.errors is None:
+        print_statistics(p[0])
 
 
 def p_sentidoA(p):
@@ -115,44 +122,124 @@ def p_intervalos_intervalos(p):
 def p_intervalo(p):
     "intervalo : '[' NUM ',' NUM ']'"
 
-    cmp_str: str = ''
+    parser.positions.append(p.lexpos(1))
 
     if parser.is_plus:
-        cmp_str = 'lesser'
-        parser.success = p[2] < p[4]
+        (cmp_str, ok) = ('lesser', p[2] < p[4])
     else:
-        cmp_str = 'greater'
-        parser.success = p[2] > p[4]
+        (cmp_str, ok) = ('greater', p[2] > p[4])
 
-    if not parser.success:
-        print(
-            f"Syntax error: lhs ('{p[2]}') is not {cmp_str} than to rhs ('{p[4]}')",
-            file=sys.stderr
-        )
-        raise SyntaxError
+    if not ok:
+        syntax_error(p.lexpos(1), f"lhs ('{p[2]}') is not {cmp_str} than to rhs ('{p[4]}')")
+        return
 
     p[0] = (p[2], p[4])
 
 
+# Resynchronizes on the next ']' after an error inside an interval
+def p_intervalo_error(p):
+    "intervalo : '[' error ']'"
+
+    parser.positions.append(p.lexpos(1))
+
+    if parser.errors is None:
+        give_up(p.lexer)
+        return
+
+    # report the errors that follow too, not just one per three tokens
+    parser.errok()
+
+
+# Leaves nothing for the parser to read past an error but the end of the line
+def give_up(lexer):
+    while lexer.token() is not None:
+        pass
+
+
+# Readies the parser (and the lexer its errors go through) for a new line;
+# every line is a sequence of its own, checked from a clean slate
+def start_line(line: str, validate: bool = False):
+    parser.success = True
+    parser.flag = True
+    parser.is_plus = True
+    parser.last = 0
+    parser.positions = list()
+    parser.errors = list() if validate else None
+    parser.end = len(line.rstrip('\n'))
+    lexer.errors = parser.errors
+
+
 # Syntatic Error handling rule
 def p_error(p):
-    print('Syntax error:', p)
+
     parser.success = False
 
+    if parser.errors is None:
+        print('Syntax error:', p)
+        if p is not None:
+            give_up(p.lexer)
+
+    elif p is None:
+        parser.errors.append((parser.end, 'unexpected end of line'))
+
+    else:
+        parser.errors.append((p.lexpos, f"unexpected '{p.value}'"))
+
 
 # Build the parser
 def main():
 
+    argp: argparse.ArgumentParser = argparse.ArgumentParser()
+    argp.add_argument('--validate', action='store_true',
+                      help='report every error of every line, with where it is, and nothing else')
+    argp.add_argument('--memprofile', action='store_true',
+                      help='trace the memory parsing takes and report it at the end')
+    argp.add_argument('--metrics-port', type=int, metavar='PORT',
+                      help='serve throughput and latency metrics on http://127.0.0.1:PORT/metrics')
+    argp.add_argument('--metrics-file', metavar='FILE',
+                      help='rewrite FILE with the same metrics every --metrics-interval seconds')
+    argp.add_argument('--metrics-interval', type=float, default=10.0, metavar='SECONDS')
+    args: argparse.Namespace = argp.parse_args()
+
+    # PLY lexes on demand and the actions print the statistics, so parsing
+    # a line is the only phase there is
+    memory: MemoryProfiler = MemoryProfiler(args.memprofile)
+    metrics: Metrics = from_args('ex1', args.metrics_port, args.metrics_file, args.metrics_interval)
+
     global parser
     parser = ply.yacc.yacc()
 
+    total: int = 0
+
     # Start parsing the input text
-    for line in sys.stdin:
-        parser.success = True
-        parser.flag = True
-        parser.is_plus = True
-        parser.last = 0
-        parser.parse(line)
+    for (number, line) in enumerate(sys.stdin, 1):
+        start_line(line, args.validate)
+        with memory.phase('parse'):
+            begin: float = time.perf_counter()
+            intervals: list[tuple[int, int]] = parser.parse(line)
+            elapsed: float = time.perf_counter() - begin
+
+        # a sign and five tokens per interval; the actions report errors on
+        # their own and recover, so all that is left of one is `success`
+        if parser.success and intervals is not None:
+            metrics.record(len(line.encode()), elapsed, 1 + 5 * len(intervals))
+        else:
+            metrics.record(len(line.encode()), elapsed, error='SyntaxError')
+
+        # the lexer reads a token ahead of the parser, so its errors may
+        # have been kept before those of the token before
+        if args.validate:
+            for (lexpos, message) in sorted(parser.errors, key=lambda e: e[0]):
+                print(f"<stdin>:{number}:{lexpos + 1}: {message}", file=sys.stderr)
+            total += len(parser.errors)
+
+    memory.report()
+    metrics.close()
+
+    if args.validate:
+        print(f"{total} errors found", file=sys.stderr)
+        if total > 0:
+            sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -4,6 +4,15 @@ import lark
 import typing
 import functools
 import sys
+import os
+import argparse
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'common'))
+
+from memprofile import MemoryProfiler
+from profiling import CallbackProfiler
+from standalone import load, syntax_errors
 
 
 # utility function
@@ -21,6 +30,8 @@ def annotate(original: typing.Any, *ansi_escape_codes: int):
     return prefix + 'm' + str(original) + '\033[0m'
 
 
+# NUMBER leaves the digits a WORD starts with to it, which Earley's lexer
+# works out by itself but the LALR one of the standalone parser doesn't
 grammar: str = '''
 start          : LIST_BEGIN elements LIST_END
 elements       : element (COMMA element)*
@@ -29,13 +40,17 @@ element        : NUMBER
 LIST_BEGIN     : /^lista/i
 LIST_END       : /\.$/
 COMMA          : /,/
-NUMBER         : /\d+/
+NUMBER         : /\d+(?!\w)/
 WORD           : /\w+/
 
 %import common.WS
 %ignore WS
 '''
 
+# the parser `make standalone` generates from the grammar above, if it has
+lists_standalone: types.ModuleType = load('lists_standalone', grammar)
+SYNTAX_ERRORS: tuple[type, ...] = syntax_errors(lists_standalone)
+
 
 Element = typing.Union[str, int]
 
@@ -153,22 +168,44 @@ def main():
         "Lista 1, 2, 2, 2, agora, 3, coiso, 4, fim, agora, 7, 81, 8, fim.",
     ]
 
-    parser: lark.Lark = lark.Lark(grammar)
+    argp: argparse.ArgumentParser = argparse.ArgumentParser()
+    argp.add_argument('--profile', action='store_true',
+                      help='time the transformer callbacks and report them at the end')
+    argp.add_argument('--memprofile', action='store_true',
+                      help='trace the memory each phase takes and report it at the end')
+    args: argparse.Namespace = argp.parse_args()
+
+    profiler: CallbackProfiler = CallbackProfiler(args.profile, MemoryProfiler(args.memprofile))
+
+    parser: lark.Lark = lark.Lark(grammar) if lists_standalone is None else None
 
     for t in tests:
 
         try:
-            tree: lark.ParseTree = parser.parse(t)
-            #print(tree.pretty())
-            ListTransformer().transform(tree)
+            # the transformer runs inside the standalone LALR parser, with
+            # no tree in between, and holds the counts of a single list
+            if lists_standalone is not None:
+                with profiler.phase('parse'):
+                    lt: ListTransformer = profiler.instrument(ListTransformer())
+                    lists_standalone.Lark_StandAlone(transformer=lt).parse(t)
+
+            else:
+                with profiler.phase('parse'):
+                    tree: lark.ParseTree = parser.parse(t)
+                #print(tree.pretty())
+                with profiler.phase('transform'):
+                    profiler.instrument(ListTransformer()).transform(tree)
+
             print(f"==> Test '{annotate(t, 1)}' {annotate('passed', 32, 1)}!\n", file=sys.stderr)
 
-        except lark.UnexpectedCharacters:
+        except SYNTAX_ERRORS:
             print(f"==> Test '{annotate(t, 1)}' {annotate('failed', 31, 1)}!\n", file=sys.stderr)
 
         except lark.GrammarError:
             print(f"==> Test '{annotate(t, 1)}' {annotate('failed', 31, 1)}!\n", file=sys.stderr)
 
+    profiler.report()
+
 
 if __name__ == '__main__':
     main()
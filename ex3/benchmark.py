@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+import lark
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'bench'))
+
+import corpus
+import students_exercise
+
+
+# students are drawn from a pool of this many names, so that the same names
+# come back across classes, as in real rosters
+NAME_POOL: int = 20000
+
+
+class NullTableWriter:
+
+    # accepts any HtmlTableWriter call and ignores it, so only the transformer is measured
+    def __getattr__(self, name):
+        return lambda *args: None
+
+
+def feed(ct: lark.Transformer, number_of_students: int, seed: int = 0):
+
+    # drives the transformer callbacks in the order lark would, without building a tree
+    for (class_id, students) in corpus.roster_classes(number_of_students, seed=seed, names=NAME_POOL):
+
+        ct.CLASS_ID(lark.Token('CLASS_ID', class_id))
+
+        for (name, grades) in students:
+
+            ct.NAME(lark.Token('NAME', name))
+            for g in grades:
+                ct.GRADE(lark.Token('GRADE', str(g)))
+
+            ct.student(None)
+
+        ct.students_class(None)
+
+
+def memory_benchmark(number_of_students: int):
+
+    tracemalloc.start()
+    base: int = tracemalloc.get_traced_memory()[0]
+
+    begin: float = time.perf_counter()
+    ct: students_exercise.ClassTransformer = students_exercise.ClassTransformer(NullTableWriter())
+    feed(ct, number_of_students)
+    elapsed: float = time.perf_counter() - begin
+
+    (current, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"Students: {number_of_students}")
+    print(f"Retained: {(current - base) / 2**20:.1f} MiB")
+    print(f"Peak:     {(peak - base) / 2**20:.1f} MiB")
+    print(f"Time:     {elapsed:.1f} s (traced)")
+
+
+def parse_benchmark(sizes: list[int]):
+
+    earley: lark.Lark = lark.Lark(students_exercise.grammar)
+    lalr: lark.Lark = lark.Lark(students_exercise.grammar, parser='lalr')
+
+    modes: dict[str, students_exercise.RosterParser] = {
+        'tree (Earley)': students_exercise.tree_parser(earley),
+        'tree (LALR)':   students_exercise.tree_parser(lalr),
+        'inline (LALR)': students_exercise.inline_parse,
+    }
+
+    print(f"{'students':>10} {'mode':<15} {'time (s)':>10} {'students/s':>12} {'peak (MiB)':>11}")
+
+    for n in sizes:
+
+        text: str = corpus.roster(n, names=NAME_POOL)
+
+        for (mode, parse) in modes.items():
+
+            # Earley is quadratic-ish in practice, keep it to the sizes it can finish
+            if mode == 'tree (Earley)' and n > 10**4:
+                continue
+
+            begin: float = time.perf_counter()
+            parse(text, NullTableWriter())
+            elapsed: float = time.perf_counter() - begin
+
+            tracemalloc.start()
+            parse(text, NullTableWriter())
+            peak: int = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            print(f"{n:>10} {mode:<15} {elapsed:>10.2f} {n / elapsed:>12.0f} {peak / 2**20:>11.1f}")
+
+
+def main():
+
+    mode: str = sys.argv[1] if len(sys.argv) > 1 else 'memory'
+
+    if mode == 'memory':
+        memory_benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 10**6)
+
+    elif mode == 'parse':
+        parse_benchmark([int(n) for n in sys.argv[2:]] or [10**3, 10**4, 10**5])
+
+    else:
+        print(f"usage: {sys.argv[0]} [memory [STUDENTS] | parse [STUDENTS...]]", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
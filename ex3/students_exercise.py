@@ -3,8 +3,25 @@
 import lark
 import typing
 import sys
-import datetime
 import io
+import array
+import argparse
+import functools
+import queue
+import threading
+import os
+import time
+import concurrent.futures
+import copy
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'common'))
+
+from roster import Roster, ClassRecord, SymbolTable
+from memprofile import MemoryProfiler
+from profiling import CallbackProfiler, DISABLED, callback_names
+from metrics import Metrics, NULL_METRICS, from_args
+from standalone import load, syntax_errors
 
 
 # utility function
@@ -37,15 +54,17 @@ GRADE          : /\d+/
 %ignore WS
 '''
 
+# the parser `make standalone` generates from the grammar above, if it has
+roster_standalone: types.ModuleType = load('roster_standalone', grammar)
+SYNTAX_ERRORS: tuple[type, ...] = syntax_errors(roster_standalone)
+
 
 class HtmlTableWriter:
 
     _string_buffer: io.StringIO
-    _grades: dict[str, [list[int]]]
 
     def __init__(self):
         self._string_buffer = io.StringIO()
-        self._grades        = None
 
     def __enter__(self):
         self.begin()
@@ -55,25 +74,30 @@ class HtmlTableWriter:
         self.end()
         self._dump()
 
-    def begin(self):
+    def begin(self, title: str = 'Classes'):
 
         self._string_buffer.write(
             '<!DOCTYPE html>\n<html>\n\t<head>\n\t\t<meta charset="utf-8"/>\n'
-            + '\t\t<title>Classes</title>\n\t</head>\n'
+            + f'\t\t<title>{title}</title>\n\t</head>\n'
         )
 
         self._string_buffer.write('\t<body>\n')
 
     def new_class(self, nclass):
-        self._grades = dict()
         self._string_buffer.write(f'\t\t<h1>{nclass}</h1>\n')
 
-    def new_student(self, student: str, grades: list[int]):
-        self._grades[student] = list(grades)
+    def end_class(self, record: ClassRecord, symbols: SymbolTable):
+
+        max_num_of_grades: int = record.max_num_of_grades()
+
+        self.begin_table(max_num_of_grades)
 
-    def end_class(self):
+        for i in range(len(record)):
+            self.row(symbols.name(record.students[i]), record.grades_of(i), max_num_of_grades)
 
-        max_num_of_grades: int = max(map(lambda e: len(e[1]), self._grades.items()))
+        self.end_table()
+
+    def begin_table(self, max_num_of_grades: int):
 
         self._string_buffer.write('\t\t<table>\n\t\t\t<tr>\n')
 
@@ -83,154 +107,260 @@ class HtmlTableWriter:
         self._string_buffer.write('\t\t\t\t<th>Média</th>\n')
         self._string_buffer.write('\t\t\t</tr>\n')
 
-        for (stu, grades) in self._grades.items():
-            self._string_buffer.write('\t\t\t<tr>\n')
+    def row(self, student: str, grades: typing.Sequence[int], max_num_of_grades: int):
+
+        self._string_buffer.write('\t\t\t<tr>\n')
 
-            self._string_buffer.write(f'\t\t\t\t<td>{stu}</td>\n')
-            for g in grades:
-                self._string_buffer.write(f'\t\t\t\t<td>{g}</td>\n')
-            for i in range(len(grades), max_num_of_grades):
-                self._string_buffer.write('\t\t\t\t<td>-</td>\n')
+        self._string_buffer.write(f'\t\t\t\t<td>{student}</td>\n')
+        for g in grades:
+            self._string_buffer.write(f'\t\t\t\t<td>{g}</td>\n')
+        for j in range(len(grades), max_num_of_grades):
+            self._string_buffer.write('\t\t\t\t<td>-</td>\n')
 
-            avg: float = sum(grades) / max_num_of_grades
-            self._string_buffer.write(f'\t\t\t\t<td>{"%.2f" % avg}</td>\n')
+        avg: float = sum(grades) / max_num_of_grades
+        self._string_buffer.write(f'\t\t\t\t<td>{"%.2f" % avg}</td>\n')
 
+    def end_table(self):
         self._string_buffer.write('\t\t\t</tr>\n')
         self._string_buffer.write('\t\t</table>\n')
 
     def end(self):
         self._string_buffer.write('\t</body>\n</html>\n')
 
+    # characters written so far, which is also the UTF-8 size give or take the accents
+    def size(self) -> int:
+        return self._string_buffer.tell()
+
+    def getvalue(self) -> str:
+        return self._string_buffer.getvalue()
+
     def _dump(self):
         with open('classes.html', 'w') as ofh:
             ofh.write(self._string_buffer.getvalue())
 
 
-class ClassTransformer(lark.Transformer):
+# Renders the pages of one class in a worker process. A page is closed once
+# it holds `students_per_page` students or reaches `max_bytes`, so it can
+# overshoot the cap by one row; a page always holds at least one student.
+def write_class_shards(directory: str, prefix: str, class_id: str,
+                       names: list[str], grades: array.array, offsets: array.array,
+                       students_per_page: int, max_bytes: int) -> list[str]:
 
-    _number_of_students: int
+    max_num_of_grades: int = max(offsets[i + 1] - offsets[i] for i in range(len(names)))
 
-    _class_to_students: dict[str, dict[str, float]]
-    _student_to_average: dict[str, float]
-    _curr_grades: list[int]
+    pages: list[str] = list()
+    htw: HtmlTableWriter = None
 
-    _class_to_grades: dict[str, dict[int, set[str]]]
-    _grade_to_students: dict[int, set[str]]
+    def close_page():
+        htw.end_table()
+        htw.end()
 
-    _curr_class: str
-    _curr_name: str
+        fn: str = f"{prefix}-{len(pages) + 1}.html"
+        with open(os.path.join(directory, fn), 'w') as ofh:
+            ofh.write(htw.getvalue())
+        pages.append(fn)
 
-    _sql_queries: list[str]
+    page_students: int = 0
 
-    _html_writer: HtmlTableWriter
+    for i in range(len(names)):
+
+        if htw is None:
+            htw = HtmlTableWriter()
+            htw.begin(f"Turma {class_id} ({len(pages) + 1})")
+            htw.new_class(class_id)
+            htw.begin_table(max_num_of_grades)
+            page_students = 0
 
-    def __init__(self, hw: HtmlTableWriter):
-        self._number_of_students = 0
+        htw.row(names[i], grades[offsets[i]:offsets[i + 1]], max_num_of_grades)
+        page_students += 1
 
-        self._class_to_students  = dict()
-        self._student_to_average = dict()
-        self._curr_grades        = list()
+        if (
+            (students_per_page and page_students >= students_per_page)
+            or (max_bytes and htw.size() >= max_bytes)
+        ):
+            close_page()
+            htw = None
 
-        self._class_to_grades    = dict()
-        self._grade_to_students  = dict()
+    if htw is not None:
+        close_page()
 
-        self._curr_class         = None
-        self._curr_name          = None
+    return pages
 
-        self._sql_queries        = list()
 
-        self._html_writer        = hw
+class ShardedHtmlWriter:
 
-    def output_data(self):
+    # Same protocol as HtmlTableWriter, but every finished class is handed to
+    # a process pool that writes its own pages into `directory`, while an
+    # index.html with one summary row per class links to them.
 
-        print(f"Number of students: {annotate(self._number_of_students, 1)}")
+    _directory: str
+    _students_per_page: int
+    _max_bytes: int
 
-        with open('classes.md', 'w') as md_file_handle:
+    _pool: concurrent.futures.ProcessPoolExecutor
+    _classes: list[tuple[str, int, float, concurrent.futures.Future]]
 
-            md_file_handle.write('# Visualizador de turmas\n')
+    def __init__(self, directory: str, students_per_page: int = 0, max_bytes: int = 0,
+                 jobs: int = None):
+        self._directory         = directory
+        self._students_per_page = students_per_page
+        self._max_bytes         = max_bytes
 
-            for (students_class, students_dict) in self._class_to_students.items():
+        self._pool              = concurrent.futures.ProcessPoolExecutor(jobs)
+        self._classes           = list()
+
+    def __enter__(self):
+        self.begin()
+        return self
 
-                md_file_handle.write(f"## Turma {students_class}\n")
+    def __exit__(self, *options):
+        self.end()
 
-                list_buffer: io.StringIO = io.StringIO()
-                list_buffer.write('### Lista de alunos\n')
+    def begin(self):
+        os.makedirs(self._directory, exist_ok=True)
 
-                table_buffer: io.StringIO = io.StringIO()
-                table_buffer.write('### Notas\n| Aluno | Media |\n|  --------  |  -------  |\n')
+    def new_class(self, nclass):
+        pass
 
-                for (student, avg) in students_dict.items():
+    def end_class(self, record: ClassRecord, symbols: SymbolTable):
 
-                    print(
-                        f"Average grade for student {annotate(student, 1)} "
-                        + f"of class {annotate(students_class, 1)}: "
-                        + f"{annotate('%.2f' % avg, 1, (32 if avg >= 9.5 else 31))}"
-                    )
+        class_id: str = symbols.name(record.class_id)
 
-                    list_buffer.write(f"- {student}\n")
-                    table_buffer.write(f"| {student} | {'%.2f' % avg} |\n")
+        # numbered so that a class id seen in several documents keeps its pages apart
+        prefix: str = f"{len(self._classes) + 1:04d}-{class_id}"
 
-                md_file_handle.write(list_buffer.getvalue())
-                md_file_handle.write('\n')
-                md_file_handle.write(table_buffer.getvalue())
-                md_file_handle.write('\n')
+        future: concurrent.futures.Future = self._pool.submit(
+            write_class_shards, self._directory, prefix, class_id,
+            [symbols.name(s) for s in record.students], record.grades, record.offsets,
+            self._students_per_page, self._max_bytes
+        )
 
-        for (students_class, grades_dict) in self._class_to_grades.items():
+        avg: float = sum(record.averages()) / len(record)
+        self._classes.append((class_id, len(record), avg, future))
 
-            for (grade, students_set) in (
-                sorted(grades_dict.items(), key=lambda e: e[0], reverse=True)
-            ):
+    def end(self):
 
-                print(
-                    f"Students of class {annotate(students_class, 1)} that scored "
-                    + f"{annotate(grade, 1)}: {annotate(students_set, 1)}"
-                )
+        index: io.StringIO = io.StringIO()
 
-        for q in self._sql_queries:
-            print(q)
+        index.write(
+            '<!DOCTYPE html>\n<html>\n\t<head>\n\t\t<meta charset="utf-8"/>\n'
+            + '\t\t<title>Classes</title>\n\t</head>\n'
+        )
+        index.write('\t<body>\n\t\t<table>\n\t\t\t<tr>\n')
+        index.write('\t\t\t\t<th>Turma</th>\n\t\t\t\t<th>Alunos</th>\n')
+        index.write('\t\t\t\t<th>Média</th>\n\t\t\t\t<th>Páginas</th>\n\t\t\t</tr>\n')
 
-    def start(self, tree: lark.Tree):
-        return self
+        for (class_id, size, avg, future) in self._classes:
 
-    def students_class(self, tree: lark.Tree):
+            links: str = ' '.join(
+                f'<a href="{fn}">{i}</a>' for (i, fn) in enumerate(future.result(), 1)
+            )
 
-        self._class_to_students[self._curr_class] = self._student_to_average
-        self._student_to_average = dict()
+            index.write('\t\t\t<tr>\n')
+            index.write(f'\t\t\t\t<td>{class_id}</td>\n\t\t\t\t<td>{size}</td>\n')
+            index.write(f'\t\t\t\t<td>{"%.2f" % avg}</td>\n\t\t\t\t<td>{links}</td>\n')
+            index.write('\t\t\t</tr>\n')
 
-        self._class_to_grades[self._curr_class] = self._grade_to_students
-        self._grade_to_students = dict()
+        index.write('\t\t</table>\n\t</body>\n</html>\n')
 
-        self._html_writer.end_class()
+        self._pool.shutdown()
 
-        return tree
+        with open(os.path.join(self._directory, 'index.html'), 'w') as ofh:
+            ofh.write(index.getvalue())
 
-    def students(self, tree: lark.Tree):
-        return tree
 
-    def student(self, tree: lark.Tree):
+class ClassTransformer(lark.Transformer):
 
-        if self._curr_name in self._student_to_average:
-            raise lark.GrammarError()
+    # Front-end feeding the shared Roster from the token and rule callbacks,
+    # which is what lets it run inside an LALR parser without a tree. The
+    # Roster does the checks and the aggregates, this only keeps track of
+    # the student whose grades are being read.
 
-        self._number_of_students += 1
+    roster: Roster
 
-        self._html_writer.new_student(self._curr_name, self._curr_grades)
+    _curr_name: str
+    _curr_grades: list[int]
 
-        avg: float = sum(self._curr_grades) / len(self._curr_grades)
-        self._student_to_average[self._curr_name] = avg
+    _html_writer: HtmlTableWriter
+
+    # without a writer the tables are only emitted by write_html
+    def __init__(self, hw: HtmlTableWriter = None):
+        self.begin(hw)
+
+    # starts over on an empty roster, so that an LALR parser built around
+    # this transformer can be kept for the next document
+    def begin(self, hw: HtmlTableWriter = None):
+        self.roster       = Roster()
+
+        self._curr_name   = None
+        self._curr_grades = list()
+
+        self._html_writer = hw
+
+    def class_count(self) -> int:
+        return self.roster.class_count()
+
+    # worked out from what the classes hold rather than counted as they are
+    # lexed: TURMA, its id and "." per class, a name and its parentheses per
+    # student, a ";" between students and a "," between grades
+    def token_count(self) -> int:
+        return sum(2 + 3 * len(r) + 2 * len(r.grades) for r in self.roster.records())
+
+    # output_data, sql_queries and write_html only cover the classes from
+    # index `since` on, which lets a caller emit just what was appended
+    def sql_queries(self, since: int = 0) -> typing.Iterator[str]:
+        return self.roster.sql_queries(since)
+
+    def output_data(self, since: int = 0):
+        self.roster.output_data(since)
+
+    def write_html(self, hw: HtmlTableWriter, since: int = 0):
+        for record in self.roster.records(since):
+            hw.new_class(self.roster.symbols.name(record.class_id))
+            hw.end_class(record, self.roster.symbols)
+
+    # hands the roster just transformed to a transformer of its own and
+    # begins again, so that the parser this one is bound to can go on with
+    # the next document while the last one is still being written out
+    def detach(self) -> 'ClassTransformer':
+
+        done: ClassTransformer = ClassTransformer(self._html_writer)
+        done.roster = self.roster
+
+        self.begin()
+
+        return done
+
+    # forgets a class whose block failed to parse, so that the transformer
+    # can go on with the next one
+    def discard_class(self):
+        self.roster.discard_class()
         self._curr_grades.clear()
 
-        query: str = (f"{annotate('INSERT INTO', 36, 1)} {annotate('Resultado', 33, 1)} "
-                      + f"(StudentName, Grade, Date, Class) {annotate('VALUES', 36, 1)} "
-                      + f"('{self._curr_name}', '{'%.2f' % avg}', '{datetime.date.today()}', "
-                      + f"'{self._curr_class}');"
-                      )
-        self._sql_queries.append(query)
+    def start(self, tree: lark.Tree):
+        return self
 
-        return tree
+    def students_class(self, tree: lark.Tree):
+
+        record: ClassRecord = self.roster.end_class()
+
+        if self._html_writer is not None:
+            self._html_writer.end_class(record, self.roster.symbols)
+
+        return None
+
+    def students(self, tree: lark.Tree):
+        return None
+
+    def student(self, tree: lark.Tree):
+
+        self.roster.add_student(self._curr_name, self._curr_grades)
+        self._curr_grades.clear()
+
+        return None
 
     def grades(self, tree: lark.Tree):
-        return tree
+        return None
 
     def CLASS(self, tree: lark.Tree):
         return lark.Discard
@@ -238,33 +368,582 @@ class ClassTransformer(lark.Transformer):
     def CLASS_ID(self, tree: lark.Tree):
 
         class_id: str = str(tree)
-        if class_id in self._class_to_students:
-            raise lark.GrammarError()
+        self.roster.begin_class(class_id)
 
-        self._html_writer.new_class(class_id)
+        if self._html_writer is not None:
+            self._html_writer.new_class(class_id)
 
-        self._curr_class = class_id
         return lark.Discard
 
     def NAME(self, tree: lark.Tree):
-        name: str = str(tree)
-        self._curr_name = name
-        return name
+        self._curr_name = str(tree)
+        return self._curr_name
 
     def GRADE(self, tree: lark.Tree):
 
         grade: int = int(tree)
 
-        if grade not in self._grade_to_students:
-            self._grade_to_students[grade] = set()
-
-        self._grade_to_students[grade].add(self._curr_name)
-
         self._curr_grades.append(grade)
 
         return grade
 
 
+class OutputPipeline:
+
+    # Renders finished documents on a background thread, in submission order,
+    # while the caller goes on parsing. The bounded queue blocks submit()
+    # once `depth` documents are waiting, so parsing never runs far ahead.
+
+    _html_writer: HtmlTableWriter
+    _queue: queue.Queue
+    _thread: threading.Thread
+    _error: BaseException
+
+    def __init__(self, hw: HtmlTableWriter, depth: int = 4):
+        self._html_writer = hw
+        self._queue       = queue.Queue(maxsize=depth)
+        self._thread      = threading.Thread(target=self._run, name='output-writer')
+        self._error       = None
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *options):
+        self._queue.put(None)
+        self._thread.join()
+
+        if self._error is not None:
+            raise self._error
+
+    def submit(self, text: str, ct: 'ClassTransformer'):
+        if self._error is not None:
+            raise self._error
+        self._queue.put((text, ct))
+
+    def _run(self):
+
+        while (job := self._queue.get()) is not None:
+
+            if self._error is not None:
+                continue
+
+            try:
+                self._emit(*job)
+            except BaseException as e:
+                self._error = e
+
+    def _emit(self, t: str, ct: 'ClassTransformer'):
+
+        if ct is not None:
+            ct.output_data()
+            ct.write_html(self._html_writer)
+
+            print(f"==> Test '{annotate(t, 1)}' {annotate('passed', 32, 1)}!", file=sys.stderr)
+
+        else:
+            print(f"==> Test '{annotate(t, 1)}' {annotate('failed', 31, 1)}!", file=sys.stderr)
+
+        print("\n")
+
+
+RosterParser = typing.Callable[[str, HtmlTableWriter], ClassTransformer]
+
+
+def tree_parser(parser: lark.Lark, profiler: CallbackProfiler = DISABLED) -> RosterParser:
+
+    names: list[str] = callback_names(parser)
+
+    def parse(t: str, hw: HtmlTableWriter = None) -> ClassTransformer:
+
+        with profiler.phase('parse'):
+            tree: lark.ParseTree = parser.parse(t)
+
+        ct: ClassTransformer = profiler.instrument(ClassTransformer(hw), names)
+
+        with profiler.phase('transform'):
+            ct.transform(tree)
+
+        return ct
+
+    return parse
+
+
+# The transformer is handed to an LALR parser, which calls it as tokens are
+# shifted and rules reduced, so no tree is ever built. Lark binds the callbacks
+# when the parser is constructed, so the parser, the standalone one when there
+# is one, is built once around a transformer that begin() resets for every
+# document; there is one such pair per profiler, whose wrappers are bound in.
+_inline_parsers: dict[CallbackProfiler, tuple[lark.Lark, ClassTransformer]] = dict()
+
+
+def _inline_parser(profiler: CallbackProfiler) -> tuple[lark.Lark, ClassTransformer]:
+
+    if profiler not in _inline_parsers:
+
+        ct: ClassTransformer = ClassTransformer()
+
+        # wrapped before lark binds them
+        if profiler.enabled:
+            profiler.instrument(ct, callback_names(lark.Lark(grammar, parser='lalr', cache=True)))
+
+        if roster_standalone is not None:
+            parser: lark.Lark = roster_standalone.Lark_StandAlone(transformer=ct)
+        else:
+            parser = lark.Lark(grammar, parser='lalr', transformer=ct, cache=True)
+
+        _inline_parsers[profiler] = (parser, ct)
+
+    return _inline_parsers[profiler]
+
+
+def inline_parse(t: str, hw: HtmlTableWriter = None,
+                 profiler: CallbackProfiler = DISABLED) -> ClassTransformer:
+
+    (parser, ct) = _inline_parser(profiler)
+    ct.begin(hw)
+
+    with profiler.phase('parse'):
+        parser.parse(t)
+
+    return ct.detach()
+
+
+class RosterWatcher:
+
+    # Tails a roster file that only grows by whole `TURMA ... .` blocks.
+    # Every poll reads the bytes appended since the last one, feeds each
+    # complete block to a single transformer that lives for the whole watch,
+    # and appends the new classes to classes.md, classes.html and stdout.
+    # A trailing block without its closing "." waits for the next poll.
+    # A file that goes away, removed or rotated, is waited for, and the one
+    # that takes its place is read from the start as if truncated.
+
+    _HTML_FOOTER: str = '\t</body>\n</html>\n'
+
+    _path: str
+    _ct: ClassTransformer
+    _parser: lark.Lark
+
+    _offset: int
+    _pending: bytes
+
+    # of the file being read, to tell when another one takes its place
+    _inode: int
+    _missing: bool
+
+    # position of the first pending byte, for error messages
+    _line: int
+    _column: int
+
+    def __init__(self, path: str):
+        self._path    = path
+        self._inode   = None
+        self._missing = False
+        self._reset()
+
+    def _reset(self):
+
+        self._ct      = ClassTransformer()
+        self._parser  = lark.Lark(grammar, parser='lalr', transformer=self._ct, cache=True)
+
+        self._offset  = 0
+        self._pending = b''
+
+        self._line    = 1
+        self._column  = 1
+
+        # truncates classes.html to an empty document, header and footer
+        with HtmlTableWriter():
+            pass
+
+    def _consume(self, text: str):
+
+        newlines: int = text.count('\n')
+
+        if newlines == 0:
+            self._column += len(text)
+        else:
+            self._line   += newlines
+            self._column  = len(text) - text.rfind('\n')
+
+    def _parse_block(self, block: str) -> bool:
+
+        try:
+            self._parser.parse(block)
+            return True
+
+        except lark.UnexpectedInput as e:
+            line: int = self._line + e.line - 1
+            column: int = e.column + (self._column - 1 if e.line == 1 else 0)
+            print(f"{self._path}:{line}:{column}: {annotate('syntax error', 31, 1)}", file=sys.stderr)
+
+        except lark.GrammarError:
+            print(
+                f"{self._path}:{self._line}:{self._column}: "
+                + f"{annotate('repeated class or student', 31, 1)}",
+                file=sys.stderr
+            )
+
+        self._ct.discard_class()
+        return False
+
+    def _append_html(self, since: int):
+
+        htw: HtmlTableWriter = HtmlTableWriter()
+        self._ct.write_html(htw, since)
+
+        with open('classes.html', 'r+') as fh:
+            fh.seek(0, io.SEEK_END)
+            fh.seek(fh.tell() - len(self._HTML_FOOTER))
+            fh.write(htw.getvalue())
+            fh.write(self._HTML_FOOTER)
+
+    def poll(self) -> bool:
+
+        # opened before it is looked at, so that both are the same file
+        try:
+            fh: io.BufferedReader = open(self._path, 'rb')
+        except FileNotFoundError:
+            if not self._missing:
+                print(f"{self._path} is gone, waiting for it", file=sys.stderr)
+                self._missing = True
+            return False
+
+        with fh:
+
+            st: os.stat_result = os.fstat(fh.fileno())
+            size: int = st.st_size
+
+            # a file made after the last one was removed may reuse its inode
+            if self._missing:
+                print(f"{self._path} is back, starting over", file=sys.stderr)
+                self._reset()
+
+            elif self._inode is not None and st.st_ino != self._inode:
+                print(f"{self._path} was replaced, starting over", file=sys.stderr)
+                self._reset()
+
+            elif size < self._offset:
+                print(f"{self._path} was truncated, starting over", file=sys.stderr)
+                self._reset()
+
+            self._inode   = st.st_ino
+            self._missing = False
+
+            if size == self._offset:
+                return False
+
+            fh.seek(self._offset)
+            data: bytes = self._pending + fh.read(size - self._offset)
+
+        self._offset = size
+
+        # "." only ever closes a block and can't be part of a multibyte character
+        end: int = data.rfind(b'.') + 1
+        self._pending = data[end:]
+
+        if end == 0:
+            return False
+
+        since: int = self._ct.class_count()
+
+        for block in data[:end].decode().split('.')[:-1]:
+            block_start: int = len(block) - len(block.lstrip())
+            self._consume(block[:block_start])
+            self._parse_block(block[block_start:] + '.')
+            self._consume(block[block_start:] + '.')
+
+        if self._ct.class_count() > since:
+            self._ct.output_data(since)
+            self._append_html(since)
+
+        return True
+
+    def watch(self, interval: float):
+        while True:
+            self.poll()
+            time.sleep(interval)
+
+
+class RosterValidator(ClassTransformer):
+
+    # Checks documents for --validate. Instead of stopping at the first
+    # error it keeps each one, with where it was found, and carries on:
+    # a repeated class is read into a scratch roster that is thrown away
+    # at its ".", a repeated student is left out of its class, and the LALR
+    # parser it runs in recovers from syntax errors through on_error (see
+    # _recover). The classes read are of no use once anything was wrong, so
+    # `errors` is all there is to look at afterwards.
+
+    # tokens inserted to get past a syntax error, at most
+    MAX_REPAIR: int = 4
+
+    errors: list[tuple[int, int, str]]
+
+    _parser: lark.Lark
+    _kept: Roster
+    _name_token: lark.Token
+    _last_error: lark.UnexpectedInput
+    _placeholders: int
+
+    def __init__(self):
+        super().__init__()
+        self._parser = lark.Lark(grammar, parser='lalr', transformer=self, cache=True)
+
+    def begin(self, hw: HtmlTableWriter = None):
+        super().begin(hw)
+
+        self.errors        = list()
+
+        self._kept         = None
+        self._name_token   = None
+        self._last_error   = None
+        self._placeholders = 0
+
+    def validate(self, t: str) -> list[tuple[int, int, str]]:
+
+        self.begin()
+
+        # what is left when even _recover can't get past the end
+        try:
+            self._parser.parse(t, on_error=self._recover)
+        except lark.UnexpectedInput as e:
+            if e is not self._last_error:
+                self._syntax_error(e)
+
+        return self.errors
+
+    def _error(self, token: lark.Token, message: str):
+        self.errors.append((token.line, token.column, message))
+
+    def _describe(self, terminal: str) -> str:
+
+        if terminal == '$END':
+            return 'end of input'
+
+        pattern: lark.lexer.Pattern = self._parser.get_terminal(terminal).pattern
+        return repr(pattern.value) if isinstance(pattern, lark.lexer.PatternStr) else terminal
+
+    def _syntax_error(self, e: lark.UnexpectedInput):
+
+        self._last_error = e
+
+        if isinstance(e, lark.UnexpectedCharacters):
+            self.errors.append((e.line, e.column, f"unexpected character {e.char!r}"))
+            return
+
+        token: lark.Token = e.token
+        found: str = 'end of input' if token.type == '$END' else repr(str(token))
+        expected: str = ', '.join(sorted(map(self._describe, e.expected)))
+
+        self.errors.append((e.line, e.column, f"unexpected {found}, expected {expected}"))
+
+    # Looks for the fewest tokens that, inserted before the one that didn't
+    # fit, let the parse go on, trying them on copies of the parser without
+    # callbacks as InteractiveParser.accepts does. Found, they are fed for
+    # real with placeholder values; otherwise the token is dropped, which
+    # lark does by itself when told to resume.
+    def _repair(self, ip: lark.parsers.lalr_interactive_parser.InteractiveParser,
+                token: lark.Token) -> list[str]:
+
+        conf = copy.copy(ip.parser_state.parse_conf)
+        conf.callbacks = dict()
+
+        def trial(inserted: list[str]):
+            cursor = ip.copy(deepcopy_values=False)
+            cursor.parser_state.parse_conf = conf
+            for terminal in inserted:
+                cursor.feed_token(lark.Token(terminal, ''))
+            return cursor
+
+        frontier: list[list[str]] = [[]]
+
+        for _ in range(self.MAX_REPAIR):
+
+            extended: list[list[str]] = list()
+
+            for inserted in frontier:
+                for terminal in sorted(t for t in trial(inserted).choices() if t.isupper()):
+
+                    if terminal == '$END':
+                        continue
+
+                    try:
+                        cursor = trial(inserted + [terminal])
+                        cursor.feed_token(lark.Token(token.type, ''))
+                    except lark.UnexpectedToken:
+                        extended.append(inserted + [terminal])
+                        continue
+
+                    return inserted + [terminal]
+
+            frontier = extended
+
+        return None
+
+    def _placeholder(self, terminal: str) -> str:
+
+        if terminal == 'GRADE':
+            return '0'
+
+        pattern: lark.lexer.Pattern = self._parser.get_terminal(terminal).pattern
+        if isinstance(pattern, lark.lexer.PatternStr):
+            return pattern.value
+
+        # never the same as a name in the document, nor as one another
+        self._placeholders += 1
+        return f"<missing {self._placeholders}>"
+
+    def _recover(self, e: lark.UnexpectedInput) -> bool:
+
+        self._syntax_error(e)
+
+        # lark skips the character itself
+        if isinstance(e, lark.UnexpectedCharacters):
+            return True
+
+        ip = e.interactive_parser
+        inserted: list[str] = self._repair(ip, e.token)
+
+        if inserted is None:
+            return e.token.type != '$END'
+
+        for terminal in inserted:
+            value: str = self._placeholder(terminal)
+            ip.feed_token(lark.Token.new_borrow_pos(terminal, value, e.token))
+
+        # the end is fed by resume_parse
+        if e.token.type != '$END':
+            ip.feed_token(e.token)
+
+        return True
+
+    def students_class(self, tree: lark.Tree):
+
+        super().students_class(tree)
+
+        if self._kept is not None:
+            (self.roster, self._kept) = (self._kept, None)
+
+        return None
+
+    def student(self, tree: lark.Tree):
+
+        try:
+            return super().student(tree)
+
+        except lark.GrammarError:
+            self._error(self._name_token, f"student {self._name_token} repeated in its class")
+            self._curr_grades.clear()
+
+        return None
+
+    def CLASS_ID(self, tree: lark.Tree):
+
+        try:
+            return super().CLASS_ID(tree)
+
+        except lark.GrammarError:
+            self._error(tree, f"class {tree} repeated")
+
+        # read into a roster of its own, so that its students are checked
+        # against one another and not against the first class of that id
+        self._kept = self.roster
+        self.roster = Roster()
+
+        return super().CLASS_ID(tree)
+
+    def NAME(self, tree: lark.Tree):
+        self._name_token = tree
+        return super().NAME(tree)
+
+
+# parses `t` and counts it in `metrics`, whether it parsed or not
+def measured_parse(parse: RosterParser, t: str, hw: HtmlTableWriter,
+                   metrics: Metrics) -> ClassTransformer:
+
+    begin: float = time.perf_counter()
+
+    try:
+        ct: ClassTransformer = parse(t, hw)
+
+    except (*SYNTAX_ERRORS, lark.GrammarError) as e:
+        metrics.record(len(t.encode()), time.perf_counter() - begin, error=type(e).__name__)
+        raise
+
+    if metrics.enabled:
+        metrics.record(len(t.encode()), time.perf_counter() - begin, ct.token_count())
+
+    return ct
+
+
+def run_sequential(parse: RosterParser, tests: list[str], html: HtmlTableWriter,
+                   profiler: CallbackProfiler = DISABLED, metrics: Metrics = NULL_METRICS):
+
+    with html as htw:
+
+        for t in tests:
+
+            try:
+                ct: ClassTransformer = measured_parse(parse, t, htw, metrics)
+                with profiler.phase('emit'):
+                    ct.output_data()
+
+                print(f"==> Test '{annotate(t, 1)}' {annotate('passed', 32, 1)}!", file=sys.stderr)
+
+            except SYNTAX_ERRORS:
+                print(f"==> Test '{annotate(t, 1)}' {annotate('failed', 31, 1)}!", file=sys.stderr)
+
+            except lark.GrammarError:
+                print(f"==> Test '{annotate(t, 1)}' {annotate('failed', 31, 1)}!", file=sys.stderr)
+
+            print("\n")
+
+
+# Unlike run_sequential, a failed document adds nothing to classes.html,
+# since its tables are only written once it has been fully transformed.
+def run_pipeline(parse: RosterParser, tests: list[str], html: HtmlTableWriter, depth: int,
+                 metrics: Metrics = NULL_METRICS):
+
+    with html as htw, OutputPipeline(htw, depth) as pipeline:
+
+        for t in tests:
+
+            try:
+                pipeline.submit(t, measured_parse(parse, t, None, metrics))
+
+            except SYNTAX_ERRORS:
+                pipeline.submit(t, None)
+
+            except lark.GrammarError:
+                pipeline.submit(t, None)
+
+
+# prints the errors of each document as file:line:column and returns the
+# exit status, 1 if there were any
+def run_validation(names: list[str], tests: list[str]) -> int:
+
+    validator: RosterValidator = RosterValidator()
+    total: int = 0
+
+    for (name, t) in zip(names, tests):
+
+        # the errors of a rule are found when it reduces, after the syntax
+        # errors of the lookahead past it; sorted, they come in the text's order
+        errors: list[tuple[int, int, str]] = sorted(validator.validate(t), key=lambda e: e[:2])
+
+        for (line, column, message) in errors:
+            print(f"{name}:{line}:{column}: {annotate('error', 31, 1)}: {message}",
+                  file=sys.stderr)
+
+        total += len(errors)
+
+    print(f"==> {total} errors found in {len(tests)} documents", file=sys.stderr)
+
+    return 1 if total > 0 else 0
+
+
 def main():
 
     tests: list[str] = [
@@ -310,27 +989,93 @@ def main():
         '''
     ]
 
-    parser: lark.Lark = lark.Lark(grammar)
-
-    with HtmlTableWriter() as htw:
-
-        for t in tests:
-
-            try:
-                tree: lark.ParseTree = parser.parse(t)
-                ct: ClassTransformer = ClassTransformer(htw)
-                ct.transform(tree)
-                ct.output_data()
-
-                print(f"==> Test '{annotate(t, 1)}' {annotate('passed', 32, 1)}!", file=sys.stderr)
-
-            except lark.UnexpectedCharacters:
-                print(f"==> Test '{annotate(t, 1)}' {annotate('failed', 31, 1)}!", file=sys.stderr)
-
-            except lark.GrammarError:
-                print(f"==> Test '{annotate(t, 1)}' {annotate('failed', 31, 1)}!", file=sys.stderr)
-
-            print("\n")
+    argp: argparse.ArgumentParser = argparse.ArgumentParser()
+    argp.add_argument('files', nargs='*', help='roster files (defaults to the built-in tests)')
+    argp.add_argument('--pipeline', action='store_true',
+                      help='render outputs on a background thread while parsing the next document')
+    argp.add_argument('--depth', type=int, default=4,
+                      help='documents allowed to wait for the writer in pipeline mode')
+    argp.add_argument('--inline', action='store_true',
+                      help='run the transformer inside an LALR parser instead of building a tree')
+    argp.add_argument('--validate', action='store_true',
+                      help='report every error of every document, with where it is, '
+                      + 'and nothing else')
+    argp.add_argument('--watch', metavar='FILE',
+                      help='follow FILE and process the blocks appended to it')
+    argp.add_argument('--interval', type=float, default=1.0,
+                      help='seconds between checks for appended data in watch mode')
+    argp.add_argument('--html-shards', metavar='DIR',
+                      help='write one HTML page per class (or per page of students) '
+                      + 'plus an index.html into DIR instead of classes.html')
+    argp.add_argument('--shard-students', type=int, default=0, metavar='N',
+                      help='students per HTML page (default: the whole class)')
+    argp.add_argument('--shard-bytes', type=int, default=0, metavar='BYTES',
+                      help='start a new HTML page once the current one reaches BYTES')
+    argp.add_argument('--jobs', type=int, default=None,
+                      help='processes writing HTML pages (default: one per core)')
+    argp.add_argument('--profile', action='store_true',
+                      help='time the transformer callbacks and report them at the end')
+    argp.add_argument('--metrics-port', type=int, metavar='PORT',
+                      help='serve throughput and latency metrics on http://127.0.0.1:PORT/metrics')
+    argp.add_argument('--metrics-file', metavar='FILE',
+                      help='rewrite FILE with the same metrics every --metrics-interval seconds')
+    argp.add_argument('--metrics-interval', type=float, default=10.0, metavar='SECONDS')
+    argp.add_argument('--memprofile', action='store_true',
+                      help='trace the memory each phase takes and report it at the end')
+    args: argparse.Namespace = argp.parse_args()
+
+    # a queue of size 0 would have no bound at all
+    if args.depth < 1:
+        argp.error('--depth must be at least 1')
+
+    # 0 leaves a page unbounded; below that there is nothing to mean
+    if args.shard_students < 0:
+        argp.error('--shard-students must be at least 0')
+    if args.shard_bytes < 0:
+        argp.error('--shard-bytes must be at least 0')
+
+    if args.jobs is not None and args.jobs < 1:
+        argp.error('--jobs must be at least 1')
+
+    if args.watch is not None:
+        try:
+            RosterWatcher(args.watch).watch(args.interval)
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if args.files:
+        tests = list()
+        for fn in args.files:
+            with open(fn) as fh:
+                tests.append(fh.read())
+
+    if args.validate:
+        names: list[str] = args.files or [f"<test {n}>" for n in range(1, len(tests) + 1)]
+        sys.exit(run_validation(names, tests))
+
+    profiler: CallbackProfiler = CallbackProfiler(args.profile, MemoryProfiler(args.memprofile))
+
+    parse: RosterParser = (
+        functools.partial(inline_parse, profiler=profiler) if args.inline
+        else tree_parser(lark.Lark(grammar), profiler)
+    )
+
+    html: HtmlTableWriter = (
+        ShardedHtmlWriter(args.html_shards, args.shard_students, args.shard_bytes, args.jobs)
+        if args.html_shards is not None else HtmlTableWriter()
+    )
+
+    metrics: Metrics = from_args('ex3', args.metrics_port, args.metrics_file, args.metrics_interval)
+
+    # the output thread of the pipeline isn't profiled, only the parsing
+    if args.pipeline:
+        run_pipeline(parse, tests, html, args.depth, metrics)
+    else:
+        run_sequential(parse, tests, html, profiler, metrics)
+
+    profiler.report()
+    metrics.close()
 
 
 if __name__ == '__main__':
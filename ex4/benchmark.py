@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+import lark
+import lark.visitors
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'bench'))
+
+import corpus
+import interpreter
+import iterative_interpreter
+import tree_cache
+
+
+# handlers that only walk, to time the engines on their own
+class StockWalker(lark.visitors.Interpreter):
+    pass
+
+
+class IterativeWalker(iterative_interpreter.IterativeInterpreter):
+    pass
+
+
+def best_of(runs: int, f: callable) -> float:
+
+    best: float = float('inf')
+
+    for _ in range(runs):
+        begin: float = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - begin)
+
+    return best
+
+
+def wide_benchmark(sizes: list[int]):
+
+    # the tree is the same as Earley's, LALR just builds it faster
+    parser: lark.Lark = lark.Lark(interpreter.grammar, parser='lalr')
+
+    print(f"{'students':>10} {'handlers':<17} {'stock (s)':>10} {'iterative (s)':>14} {'speedup':>8}")
+
+    for n in sizes:
+
+        tree: lark.ParseTree = parser.parse(corpus.roster(n))
+
+        for (handlers, stock_cls, iterative_cls) in [
+            ('ClassInterpreter', interpreter.ClassInterpreter, interpreter.IterativeClassInterpreter),
+            ('walk only', StockWalker, IterativeWalker),
+        ]:
+            stock: float = best_of(5, lambda: stock_cls().visit(tree))
+            iterative: float = best_of(5, lambda: iterative_cls().visit(tree))
+
+            print(f"{n:>10} {handlers:<17} {stock:>10.3f} {iterative:>14.3f} {stock / iterative:>7.2f}x")
+
+
+def deep_benchmark(depths: list[int]):
+
+    print(f"{'depth':>10} {'stock (s)':>10} {'iterative (s)':>14}")
+
+    for depth in depths:
+
+        tree: lark.Tree = lark.Tree('leaf', [lark.Token('X', 'x')])
+        for _ in range(depth):
+            tree = lark.Tree('node', [tree])
+
+        try:
+            stock: str = f"{best_of(3, lambda: StockWalker().visit(tree)):>10.3f}"
+        except RecursionError:
+            stock = f"{'overflow':>10}"
+
+        iterative: float = best_of(3, lambda: IterativeWalker().visit(tree))
+
+        print(f"{depth:>10} {stock} {iterative:>14.3f}")
+
+
+def cache_benchmark(sizes: list[int]):
+
+    earley: lark.Lark = lark.Lark(interpreter.grammar)
+    lalr: lark.Lark = lark.Lark(interpreter.grammar, parser='lalr')
+
+    print(f"{'students':>10} {'Earley (s)':>11} {'LALR (s)':>10} {'cache hit (s)':>14} {'entry (KiB)':>12}")
+
+    with tempfile.TemporaryDirectory() as directory:
+
+        cache: tree_cache.TreeCache = tree_cache.TreeCache(directory, interpreter.grammar)
+
+        for n in sizes:
+
+            text: str = corpus.roster(n)
+
+            fresh: float = best_of(1, lambda: earley.parse(text))
+            fast: float = best_of(3, lambda: lalr.parse(text))
+
+            before: int = sum(e.stat().st_size for e in os.scandir(directory))
+            cache.put(text, lalr.parse(text))
+            size: int = sum(e.stat().st_size for e in os.scandir(directory)) - before
+
+            hit: float = best_of(3, lambda: cache.get(text))
+
+            print(f"{n:>10} {fresh:>11.3f} {fast:>10.3f} {hit:>14.3f} {size / 2**10:>12.1f}")
+
+
+def main():
+
+    mode: str = sys.argv[1] if len(sys.argv) > 1 else 'visit'
+    sizes: list[int] = [int(n) for n in sys.argv[2:]]
+
+    if mode == 'visit':
+        wide_benchmark(sizes or [10**3, 10**4, 10**5])
+        print()
+        deep_benchmark([10**2, 10**3, 10**5])
+
+    elif mode == 'cache':
+        cache_benchmark(sizes or [10**2, 10**3, 10**4])
+
+    else:
+        print(f"usage: {sys.argv[0]} [visit | cache] [STUDENTS...]", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
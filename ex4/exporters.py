@@ -0,0 +1,98 @@
+import abc
+import csv
+import json
+import os
+import typing
+
+from roster import ClassRecord, SymbolTable
+
+
+class RosterExporter(abc.ABC):
+
+    # Writes one class at a time into two files under `directory`: a row per
+    # student and a row per grade bucket. Nothing is held back between
+    # classes, so memory stays flat however long the roster is, and the
+    # files can be bulk loaded (COPY ... FROM ... CSV HEADER) as they are.
+
+    _students_file: typing.TextIO
+    _grades_file: typing.TextIO
+
+    def __init__(self, directory: str, extension: str):
+        os.makedirs(directory, exist_ok=True)
+        self._students_file = open(os.path.join(directory, f"students.{extension}"), 'w', newline='')
+        self._grades_file   = open(os.path.join(directory, f"grades.{extension}"), 'w', newline='')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *options):
+        self.close()
+
+    def close(self):
+        self._students_file.close()
+        self._grades_file.close()
+
+    def write_class(self, record: ClassRecord, symbols: SymbolTable):
+
+        class_id: str = symbols.name(record.class_id)
+
+        for (i, (student, avg)) in enumerate(zip(record.students, record.averages())):
+            self.write_student(class_id, symbols.name(student), list(record.grades_of(i)), avg)
+
+        for (grade, students) in record.grade_buckets():
+            self.write_bucket(class_id, grade, [symbols.name(s) for s in students])
+
+    @abc.abstractmethod
+    def write_student(self, class_id: str, name: str, grades_list: list[int], avg: float):
+        pass
+
+    @abc.abstractmethod
+    def write_bucket(self, class_id: str, grade: int, students: list[str]):
+        pass
+
+
+class CsvExporter(RosterExporter):
+
+    # students.csv: class,name,grades,average with grades as an array literal
+    # grades.csv:   class,grade,name, one row per student in the bucket
+
+    _students_writer: csv.writer
+    _grades_writer: csv.writer
+
+    def __init__(self, directory: str):
+        super().__init__(directory, 'csv')
+
+        self._students_writer = csv.writer(self._students_file, lineterminator='\n')
+        self._grades_writer   = csv.writer(self._grades_file, lineterminator='\n')
+
+        self._students_writer.writerow(('class', 'name', 'grades', 'average'))
+        self._grades_writer.writerow(('class', 'grade', 'name'))
+
+    def write_student(self, class_id: str, name: str, grades_list: list[int], avg: float):
+        self._students_writer.writerow(
+            (class_id, name, '{' + ','.join(map(str, grades_list)) + '}', repr(avg))
+        )
+
+    def write_bucket(self, class_id: str, grade: int, students: list[str]):
+        self._grades_writer.writerows((class_id, grade, name) for name in students)
+
+
+class JsonLinesExporter(RosterExporter):
+
+    # students.jsonl: {"class", "name", "grades", "average"} per line
+    # grades.jsonl:   {"class", "grade", "students"} per line
+
+    def __init__(self, directory: str):
+        super().__init__(directory, 'jsonl')
+
+    def write_student(self, class_id: str, name: str, grades_list: list[int], avg: float):
+        self._students_file.write(json.dumps(
+            {'class': class_id, 'name': name, 'grades': grades_list, 'average': avg}
+        ))
+        self._students_file.write('\n')
+
+    def write_bucket(self, class_id: str, grade: int, students: list[str]):
+        self._grades_file.write(json.dumps(
+            {'class': class_id, 'grade': grade, 'students': students}
+        ))
+        self._grades_file.write('\n')
@@ -5,8 +5,17 @@ import lark.visitors
 import lark.tree
 import typing
 import sys
-import datetime
-import io
+import os
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'common'))
+
+from roster import Roster, ClassRecord
+from memprofile import MemoryProfiler
+from profiling import CallbackProfiler, callback_names
+from iterative_interpreter import IterativeInterpreter
+from exporters import RosterExporter, CsvExporter, JsonLinesExporter
+from tree_cache import TreeCache
 
 
 # utility function
@@ -42,126 +51,47 @@ GRADE          : /\d+/
 
 class ClassInterpreter(lark.visitors.Interpreter):
 
-    # 1.1
-    _number_of_students: int
-
-    # 1.2
-    _class_to_students: dict[str, dict[str, float]]
+    # Front-end feeding the shared Roster one class at a time, once the
+    # class has been visited; the Roster does the checks and the aggregates,
+    # and visit() hands it back.
 
-    # 1.3
-    _class_to_grades: dict[str, dict[int, set[str]]]
+    roster: Roster
 
-    # 1.4
-    _sql_queries: list[str]
+    # each class goes to the exporters as soon as it is visited; without
+    # keep_results that is all that happens to it
+    _exporters: typing.Sequence[RosterExporter]
 
-    def __init__(self):
+    def __init__(self, exporters: typing.Sequence[RosterExporter] = (), keep_results: bool = True):
 
-        self._number_of_students = 0
-        self._class_to_students = dict()
-        self._class_to_grades = dict()
-        self._sql_queries = list()
+        self.roster     = Roster(keep_results)
+        self._exporters = exporters
 
     def output_data(self):
-
-        print(f"Number of students: {annotate(self._number_of_students, 1)}")
-
-        with open('classes.md', 'w') as md_file_handle:
-
-            md_file_handle.write('# Visualizador de turmas\n')
-
-            for (class_id, students_dict) in self._class_to_students.items():
-
-                md_file_handle.write(f"## Turma {class_id}\n")
-
-                list_buffer: io.StringIO = io.StringIO()
-                list_buffer.write('### Lista de alunos\n')
-
-                table_buffer: io.StringIO = io.StringIO()
-                table_buffer.write('### Notas\n| Aluno | Media |\n|  --------  |  -------  |\n')
-
-                for (student, avg) in students_dict.items():
-
-                    print(
-                        f"Average grade for student {annotate(student, 1)} "
-                        + f"of class {annotate(class_id, 1)}: "
-                        + f"{annotate('%.2f' % avg, 1, (32 if avg >= 9.5 else 31))}"
-                    )
-
-                    list_buffer.write(f"- {student}\n")
-                    table_buffer.write(f"| {student} | {'%.2f' % avg} |\n")
-
-                md_file_handle.write(list_buffer.getvalue())
-                md_file_handle.write('\n')
-                md_file_handle.write(table_buffer.getvalue())
-                md_file_handle.write('\n')
-
-        for (class_id, grades_dict) in self._class_to_grades.items():
-            for (grade, students_set) in (
-                sorted(grades_dict.items(), key=lambda e: e[0], reverse=True)
-            ):
-                print(
-                    f"Students of class {annotate(class_id, 1)} that scored "
-                    + f"{annotate(grade, 1)}: {annotate(students_set, 1)}"
-                )
-
-        for q in self._sql_queries:
-            print(q)
+        self.roster.output_data()
 
     def start(self, tree: lark.Tree):
 
         for sclass in tree.children:
+            self.visit(sclass)
 
-            (class_id, students_dict, grades_dict) = self.visit(sclass)
-            if class_id in self._class_to_students or class_id in self._class_to_grades:
-                raise lark.GrammarError()
-
-            self._class_to_students[class_id] = students_dict
-            self._class_to_grades[class_id] = grades_dict
+        return self.roster
 
     def students_class(self, tree: lark.Tree):
 
-        (student_to_avg, grade_to_students) = self.visit(tree.children[2])
+        record: ClassRecord = self.roster.add_class(
+            str(tree.children[1].value), self.visit(tree.children[2])
+        )
 
-        for (name, avg) in student_to_avg.items():
+        for e in self._exporters:
+            e.write_class(record, self.roster.symbols)
 
-            query: str = (
-                f"{annotate('INSERT INTO', 36, 1)} {annotate('Resultado', 33, 1)} "
-                + f"(StudentName, Grade, Date, Class) {annotate('VALUES', 36, 1)} "
-                + f"('{name}', '{'%.2f' % avg}', '{datetime.date.today()}', "
-                + f"'{str(tree.children[1].value)}');"
-            )
-            self._sql_queries.append(query)
-
-        return (str(tree.children[1].value), student_to_avg, grade_to_students)
+        return record
 
     def students(self, tree: lark.Tree):
-
-        student_to_avg: dict[str, float] = dict()
-        grade_to_students: dict[int, set[str]] = dict()
-
-        for student in tree.children:
-
-            (name, grades_list) = self.visit(student)
-            if name in student_to_avg:
-                raise lark.GrammarError()
-
-            grades_sum: int = 0
-            for g in grades_list:
-                grades_sum += g
-
-                if g not in grade_to_students:
-                    grade_to_students[g] = set()
-
-                grade_to_students[g].add(name)
-
-            student_to_avg[name] = grades_sum / len(grades_list)
-
-        return (student_to_avg, grade_to_students)
+        return [self.visit(student) for student in tree.children]
 
     def student(self, tree: lark.Tree):
 
-        self._number_of_students += 1
-
         grades_list: list[int] = self.visit(tree.children[1])
 
         return (str(tree.children[0].value), grades_list)
@@ -171,6 +101,11 @@ class ClassInterpreter(lark.visitors.Interpreter):
         return [int(g.value) for g in tree.children]
 
 
+# same handlers, evaluated bottom-up by the explicit-stack engine
+class IterativeClassInterpreter(IterativeInterpreter, ClassInterpreter):
+    pass
+
+
 def main():
 
     tests: list[str] = [
@@ -188,15 +123,63 @@ def main():
         '''
     ]
 
+    argp: argparse.ArgumentParser = argparse.ArgumentParser()
+    argp.add_argument('files', nargs='*', help='roster files (defaults to the built-in tests)')
+    argp.add_argument('--iterative', action='store_true',
+                      help='visit the tree with the explicit-stack engine')
+    argp.add_argument('--csv', metavar='DIR',
+                      help='stream students.csv and grades.csv into DIR')
+    argp.add_argument('--jsonl', metavar='DIR',
+                      help='stream students.jsonl and grades.jsonl into DIR')
+    argp.add_argument('--export-only', action='store_true',
+                      help='only write the exports, without keeping or printing the results')
+    argp.add_argument('--cache', metavar='DIR',
+                      help='reuse the trees of inputs parsed before, kept in DIR')
+    argp.add_argument('--cache-size', type=int, default=64 * 2**20, metavar='BYTES',
+                      help='size past which the least recently used trees are evicted')
+    argp.add_argument('--profile', action='store_true',
+                      help='time the interpreter handlers and report them at the end')
+    argp.add_argument('--memprofile', action='store_true',
+                      help='trace the memory each phase takes and report it at the end')
+    args: argparse.Namespace = argp.parse_args()
+
+    exporters: list[RosterExporter] = list()
+    if args.csv is not None:
+        exporters.append(CsvExporter(args.csv))
+    if args.jsonl is not None:
+        exporters.append(JsonLinesExporter(args.jsonl))
+
+    if args.files:
+        tests = list()
+        for fn in args.files:
+            with open(fn) as fh:
+                tests.append(fh.read())
+
+    interpreter: type = IterativeClassInterpreter if args.iterative else ClassInterpreter
+
     parser: lark.Lark = lark.Lark(grammar)
 
+    profiler: CallbackProfiler = CallbackProfiler(args.profile, MemoryProfiler(args.memprofile))
+    names: list[str] = callback_names(parser)
+
+    cache: TreeCache = None
+    if args.cache is not None:
+        cache = TreeCache(args.cache, grammar, args.cache_size)
+
     for t in tests:
 
         try:
-            tree: lark.ParseTree = parser.parse(t)
-            ci: ClassInterpreter = ClassInterpreter()
-            ci.visit(tree)
-            ci.output_data()
+            with profiler.phase('parse'):
+                tree: lark.ParseTree = parser.parse(t) if cache is None else cache.parse(parser, t)
+
+            ci: ClassInterpreter = profiler.instrument(interpreter(exporters, not args.export_only), names)
+
+            with profiler.phase('transform'):
+                ci.visit(tree)
+
+            if not args.export_only:
+                with profiler.phase('emit'):
+                    ci.output_data()
 
             print(f"==> test '{annotate(t, 1)}' {annotate('passed', 32, 1)}!", file=sys.stderr)
 
@@ -208,6 +191,11 @@ def main():
 
         print("\n")
 
+    for e in exporters:
+        e.close()
+
+    profiler.report()
+
 
 if __name__ == '__main__':
     main()
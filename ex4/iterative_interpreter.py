@@ -0,0 +1,83 @@
+import lark
+import lark.visitors
+import lark.tree
+import typing
+
+
+Handler = typing.Callable[[lark.tree.Tree], typing.Any]
+
+
+class IterativeInterpreter(lark.visitors.Interpreter):
+
+    # Drop-in engine for lark.visitors.Interpreter subclasses that walks the
+    # tree with an explicit stack instead of recursing through visit().
+    #
+    # Every subtree is evaluated once, children before parents and in
+    # document order, and its result is kept until its parent asks for it:
+    # self.visit(child) and self.visit_children(tree) hand the stored result
+    # out (a second visit evaluates the subtree again, as the stock engine
+    # would). Handlers written for the stock Interpreter thus run unchanged
+    # as long as they visit all of their subtrees and don't depend on a
+    # parent running before its children.
+    #
+    # Handlers are looked up once per rule name and kept in a dispatch table.
+
+    _dispatch: dict[str, Handler] = None
+    _pending: dict[int, typing.Any] = None
+
+    def visit(self, tree: lark.tree.Tree):
+
+        try:
+            return self._pending.pop(id(tree))
+
+        # not walking (no results yet) or a tree from outside of the walk
+        except (AttributeError, KeyError):
+            return self._walk(tree)
+
+    def _visit_tree(self, tree: lark.tree.Tree):
+        return self.visit(tree)
+
+    def _resolve(self, rule: str) -> Handler:
+
+        f: typing.Callable = getattr(self, rule)
+        wrapper: typing.Callable = getattr(f, 'visit_wrapper', None)
+
+        if wrapper is not None:
+            def handler(tree: lark.tree.Tree):
+                return wrapper(f, tree.data, tree.children, tree.meta)
+        else:
+            handler = f
+
+        self._dispatch[rule] = handler
+        return handler
+
+    def _walk(self, root: lark.tree.Tree):
+
+        # a visit() on a tree outside of the current walk starts a nested one
+        outer: dict[int, typing.Any] = self._pending
+        results: dict[int, typing.Any] = dict()
+        self._pending = results
+
+        if self._dispatch is None:
+            self._dispatch = dict()
+        dispatch: dict[str, Handler] = self._dispatch
+
+        try:
+            # children are pushed left to right, so they are popped right to
+            # left; reversed, that pre-order is the left-to-right post-order
+            order: list[lark.tree.Tree] = list()
+            stack: list[lark.tree.Tree] = [root]
+
+            while stack:
+                node: lark.tree.Tree = stack.pop()
+                order.append(node)
+                stack.extend([c for c in node.children if isinstance(c, lark.tree.Tree)])
+
+            for node in reversed(order):
+                handler: Handler = dispatch.get(node.data) or self._resolve(node.data)
+                results[id(node)] = handler(node)
+
+            return results.pop(id(root))
+
+        finally:
+            self._pending = outer
@@ -0,0 +1,60 @@
+import lark
+import hashlib
+import marshal
+import sys
+import typing
+import zlib
+
+from disk_cache import DiskCache, encode, decode
+
+
+# bump whenever the encoding below changes
+FORMAT_VERSION: int = 1
+
+
+class TreeCache(DiskCache):
+
+    # Parse trees on disk, one zlib-compressed marshal file per input, named
+    # after a hash of the grammar, the lark and python versions and the input
+    # itself, and evicted by least recent use as DiskCache does.
+
+    _salt: bytes
+
+    def __init__(self, directory: str, grammar: str, max_bytes: int = 64 * 2**20):
+        super().__init__(directory, '.tree', max_bytes)
+
+        self._salt = '\0'.join((
+            grammar, lark.__version__, sys.version, str(FORMAT_VERSION)
+        )).encode()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(self._salt + b'\0' + text.encode()).hexdigest()
+
+    def get(self, text: str) -> typing.Optional[lark.Tree]:
+
+        key: str = self._key(text)
+        data: bytes = self.read(key)
+
+        if data is None:
+            return None
+
+        # a truncated or otherwise damaged entry, e.g. from a full disk, is a
+        # miss; it is removed so that the parse that follows replaces it
+        try:
+            return decode(marshal.loads(zlib.decompress(data)))
+        except (zlib.error, EOFError, ValueError, TypeError, IndexError):
+            self.discard(key)
+            return None
+
+    def put(self, text: str, tree: lark.Tree):
+        self.write(self._key(text), zlib.compress(marshal.dumps(encode(tree)), 1))
+
+    def parse(self, parser: lark.Lark, text: str) -> lark.Tree:
+
+        tree: lark.Tree = self.get(text)
+
+        if tree is None:
+            tree = parser.parse(text)
+            self.put(text, tree)
+
+        return tree
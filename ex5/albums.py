@@ -6,6 +6,19 @@ import lark.tree
 import typing
 import sys
 import io
+import os
+import argparse
+import time
+import concurrent.futures
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'common'))
+
+from memprofile import MemoryProfiler
+from profiling import CallbackProfiler, callback_names
+from thumbnails import ThumbnailCache
+from fragment_cache import FragmentCache
+from standalone import load, syntax_errors
 
 
 # utility function
@@ -23,6 +36,9 @@ def annotate(original: typing.Any, *ansi_escape_codes: int):
     return prefix + 'm' + str(original) + '\033[0m'
 
 
+# A sheet is a single photo, so that each of a run of photos without a
+# separator gets a page of its own: `sheet : photo+` left it open where one
+# sheet ends and the next begins, which Earley settles but LALR can't.
 grammar: str = '''
 album     : cover "[" page+ "]" backcover
 cover     : title author DATE
@@ -32,7 +48,7 @@ backcover : closure DATE
 closure   : STRING
 page      : sep | sheet
 sep       : title
-sheet     : photo+
+sheet     : photo
 photo     : FILE caption
 caption   : STRING
 STRING    : /".+?"/
@@ -43,24 +59,66 @@ DATE      : /\d\d-\d\d-\d\d\d\d/
 %ignore WS
 '''
 
+# the parser `make standalone` generates from the grammar above, if it has
+album_standalone: types.ModuleType = load('album_standalone', grammar, start='album')
+SYNTAX_ERRORS: tuple[type, ...] = syntax_errors(album_standalone)
 
-class AlbumInterpreter(lark.visitors.Interpreter):
-
-    _fig_count:     int
-    _output_buffer: io.StringIO
 
-    def __init__(self):
-        self._fig_count     = 0
-        self._output_buffer = io.StringIO()
+class AlbumInterpreter(lark.visitors.Interpreter):
 
-    def print_output(self, fn: str):
-        with open(fn, 'w') as fh:
-            fh.write(self._output_buffer.getvalue().strip())
+    # Writes the LaTeX for an album into `out` one page at a time: the cover
+    # and every page are rendered into a small buffer that is handed to the
+    # file as soon as they are finished, so only the page being rendered is
+    # kept in memory. Trailing whitespace is held back until more text
+    # follows, which leaves the file stripped as it was when written in one go.
+    #
+    # `graphics` maps FILE names to what \includegraphics should load
+    # instead, e.g. the thumbnails from a ThumbnailCache.
+    #
+    # With a FragmentCache, pages rendered before are spliced in from it, and
+    # the rest are rendered with a note of where each figure number goes, so
+    # that they can be cached regardless of where they fall in the album.
+
+    _fig_count:   int
+    _out:         typing.TextIO
+    _page_buffer: io.StringIO
+    _held:        str
+    _graphics:    dict[str, str]
+    _fragments:   FragmentCache
+
+    # where caption() left out the figure numbers while a page is being cached
+    _cuts:        list[int]
+
+    def __init__(self, out: typing.TextIO, graphics: dict[str, str] = None,
+                 fragments: FragmentCache = None):
+        self._fig_count   = 0
+        self._out         = out
+        self._page_buffer = io.StringIO()
+        self._held        = ''
+        self._graphics    = graphics or dict()
+        self._fragments   = fragments
+        self._cuts        = None
+
+    def _flush_page(self):
+
+        text: str = self._page_buffer.getvalue()
+        body: str = text.rstrip()
+
+        if body:
+            self._out.write(self._held + body)
+            self._held = text[len(body):]
+        else:
+            self._held += text
+
+        self._page_buffer.seek(0)
+        self._page_buffer.truncate()
 
     def album(self, tree: lark.tree.Tree):
 
         self.visit(tree.children[0])  # cover
-        for page in range(1, len(tree.children) - 1):
+        self._flush_page()
+
+        for page in tree.children[1:-1]:
             self.visit(page)
 
     def cover(self, tree: lark.tree.Tree):
@@ -69,36 +127,304 @@ class AlbumInterpreter(lark.visitors.Interpreter):
 
     def title(self, tree: lark.tree.Tree):
         value: str = tree.children[0].value.strip('"')
-        self._output_buffer.write(f"\\title{{{value}}}\n")
+        self._page_buffer.write(f"\\title{{{value}}}\n")
 
     def author(self, tree: lark.tree.Tree):
         value: str = tree.children[0].value.strip('"')
-        self._output_buffer.write(f"\\author{{{value}}}\n")
+        self._page_buffer.write(f"\\author{{{value}}}\n")
 
     def page(self, tree: lark.tree.Tree):
-        self.visit(tree.children[0])
-        self._output_buffer.write("\n\\newpage\n\n")
+
+        if self._fragments is None:
+            self.visit(tree.children[0])
+            self._page_buffer.write("\n\\newpage\n\n")
+            self._flush_page()
+            return
+
+        key: str = self._fragments.key(tree, self._graphics)
+        pieces: list[str] = self._fragments.get(key)
+
+        if pieces is None:
+            pieces = self._render_pieces(tree)
+            self._fragments.put(key, pieces)
+
+        # the k-th figure of the page is figure _fig_count + k of the album
+        self._page_buffer.write(pieces[0])
+        for (k, piece) in enumerate(pieces[1:], 1):
+            self._page_buffer.write(str(self._fig_count + k))
+            self._page_buffer.write(piece)
+
+        self._fig_count += len(pieces) - 1
+        self._flush_page()
+
+    # the page as the text between its figure numbers
+    def _render_pieces(self, tree: lark.tree.Tree) -> list[str]:
+
+        fig_count: int = self._fig_count
+        cuts: list[int] = list()
+        self._cuts = cuts
+
+        try:
+            self.visit(tree.children[0])
+            self._page_buffer.write("\n\\newpage\n\n")
+        finally:
+            self._cuts      = None
+            self._fig_count = fig_count
+
+        text: str = self._page_buffer.getvalue()
+        pieces: list[str] = [text[a:b] for (a, b) in zip([0, *cuts], [*cuts, len(text)])]
+
+        self._page_buffer.seek(0)
+        self._page_buffer.truncate()
+
+        return pieces
 
     def sep(self, tree: lark.tree.Tree):
         self.visit(tree.children[0])
 
+    def sheet(self, tree: lark.tree.Tree):
+        for photo in tree.children:
+            self.visit(photo)
+
     def photo(self, tree: lark.tree.Tree):
         self._fig_count += 1
 
-        self._output_buffer.write("\\begin{figure}[h!]\n")
-        self._output_buffer.write("\\centering\n")
-        self._output_buffer.write(
-            f"\\includegraphics[width=0.3\\textwidth]{{{tree.children[0].value}}}\n"
+        name: str = tree.children[0].value
+
+        self._page_buffer.write("\\begin{figure}[h!]\n")
+        self._page_buffer.write("\\centering\n")
+        self._page_buffer.write(
+            f"\\includegraphics[width=0.3\\textwidth]{{{self._graphics.get(name, name)}}}\n"
         )
         self.visit(tree.children[1])
-        self._output_buffer.write("\\end{figure}\n")
+        self._page_buffer.write("\\end{figure}\n")
 
     def caption(self, tree: lark.tree.Tree):
         value: str = tree.children[0].value.strip('"')
-        self._output_buffer.write(
+
+        if self._cuts is None:
+            self._page_buffer.write(f"\\caption{{\\label{{fig:fig{self._fig_count}}}{value}}}\n")
+            return
+
+        self._page_buffer.write("\\caption{\\label{fig:fig")
+        self._cuts.append(self._page_buffer.tell())
+        self._page_buffer.write(f"}}{value}}}\n")
+
+
+class AlbumEmitter(lark.Transformer):
+
+    # The LaTeX of AlbumInterpreter, written by an LALR parser's callbacks as
+    # it reduces each rule, so the album never exists as a tree. Rules reduce
+    # bottom-up, so what comes out of a title or a caption is handed up to
+    # the rule that knows where it goes, and every page is written out once
+    # its `page` is reduced. begin() points it at the next output, so a
+    # single parser can be built around it and kept for every album.
+
+    _fig_count:   int
+    _out:         typing.TextIO
+    _page_buffer: io.StringIO
+    _held:        str
+
+    def __init__(self, out: typing.TextIO = None):
+        self._page_buffer = io.StringIO()
+        self.begin(out)
+
+    def begin(self, out: typing.TextIO):
+        self._fig_count   = 0
+        self._out         = out
+        self._held        = ''
+        self._page_buffer.seek(0)
+        self._page_buffer.truncate()
+
+    def _flush_page(self):
+
+        text: str = self._page_buffer.getvalue()
+        body: str = text.rstrip()
+
+        if body:
+            self._out.write(self._held + body)
+            self._held = text[len(body):]
+        else:
+            self._held += text
+
+        self._page_buffer.seek(0)
+        self._page_buffer.truncate()
+
+    def title(self, tree: list):
+        return tree[0].value.strip('"')
+
+    def author(self, tree: list):
+        return tree[0].value.strip('"')
+
+    def caption(self, tree: list):
+        return tree[0].value.strip('"')
+
+    def cover(self, tree: list):
+        self._page_buffer.write(f"\\title{{{tree[0]}}}\n")
+        self._page_buffer.write(f"\\author{{{tree[1]}}}\n")
+        self._flush_page()
+
+    def sep(self, tree: list):
+        self._page_buffer.write(f"\\title{{{tree[0]}}}\n")
+
+    def photo(self, tree: list):
+        self._fig_count += 1
+
+        self._page_buffer.write("\\begin{figure}[h!]\n")
+        self._page_buffer.write("\\centering\n")
+        self._page_buffer.write(
+            f"\\includegraphics[width=0.3\\textwidth]{{{tree[0].value}}}\n"
+        )
+        self._page_buffer.write(
             f"\\caption{{\\label{{fig:fig{self._fig_count}}}" +
-            f"{value}}}\n"
+            f"{tree[1]}}}\n"
         )
+        self._page_buffer.write("\\end{figure}\n")
+
+    def page(self, tree: list):
+        self._page_buffer.write("\n\\newpage\n\n")
+        self._flush_page()
+
+    def sheet(self, tree: list):
+        return None
+
+    def closure(self, tree: list):
+        return None
+
+    def backcover(self, tree: list):
+        return None
+
+    def album(self, tree: list):
+        return None
+
+
+# the standalone parser when there is one, which raises SYNTAX_ERRORS
+def inline_parser(emitter: AlbumEmitter) -> lark.Lark:
+
+    if album_standalone is not None:
+        return album_standalone.Lark_StandAlone(transformer=emitter)
+
+    return lark.Lark(grammar, start='album', parser='lalr', lexer='contextual', transformer=emitter)
+
+
+def photo_files(tree: lark.ParseTree) -> typing.Iterator[str]:
+    return (str(t) for t in tree.scan_values(lambda v: isinstance(v, lark.Token) and v.type == 'FILE'))
+
+
+# Each worker process compiles the grammar once, in init_worker, and reuses
+# that parser for every album it is handed. Workers make their own missing
+# thumbnails, being already spread over the cores.
+_worker_parser: lark.Lark = None
+_worker_emitter: AlbumEmitter = None
+_worker_thumbnails: ThumbnailCache = None
+_worker_fragments: FragmentCache = None
+
+
+def init_worker(thumbnail_args: tuple = None, fragments: str = None, inline: bool = False):
+    global _worker_parser, _worker_emitter, _worker_thumbnails, _worker_fragments
+    if inline:
+        _worker_emitter = AlbumEmitter()
+        _worker_parser  = inline_parser(_worker_emitter)
+    else:
+        _worker_parser  = lark.Lark(grammar, start='album')
+    if thumbnail_args is not None:
+        _worker_thumbnails = ThumbnailCache(*thumbnail_args, jobs=0)
+    if fragments is not None:
+        _worker_fragments = FragmentCache(fragments)
+
+
+# (source, None) once `dst` is written, (source, reason) otherwise
+def compile_album(src: str, dst: str) -> tuple[str, typing.Optional[str]]:
+
+    try:
+        with open(src) as fh:
+            text: str = fh.read()
+
+        if _worker_emitter is not None:
+            try:
+                with open(dst, 'w') as fh:
+                    _worker_emitter.begin(fh)
+                    _worker_parser.parse(text)
+
+            # the LaTeX went out as it was parsed, so a bad album leaves half of it
+            except SYNTAX_ERRORS:
+                os.remove(dst)
+                raise
+
+            return (src, None)
+
+        tree: lark.ParseTree = _worker_parser.parse(text)
+
+        graphics: dict[str, str] = None
+        if _worker_thumbnails is not None:
+            graphics = _worker_thumbnails.thumbnails(photo_files(tree), os.path.dirname(dst))
+
+        with open(dst, 'w') as fh:
+            AlbumInterpreter(fh, graphics, _worker_fragments).visit(tree)
+
+    except SYNTAX_ERRORS as e:
+        return (src, f"syntax error at {e.line}:{e.column}")
+
+    except lark.GrammarError:
+        return (src, 'grammar error')
+
+    # Pillow's UnidentifiedImageError has no strerror
+    except OSError as e:
+        return (src, e.strerror or str(e))
+
+    except UnicodeDecodeError as e:
+        return (src, f"{e.encoding} can't decode byte {e.start}: {e.reason}")
+
+    # thumbnails wanted without Pillow
+    except RuntimeError as e:
+        return (src, str(e))
+
+    return (src, None)
+
+
+def run_batch(directory: str, output: str, suffix: str, jobs: int,
+              thumbnail_args: tuple = None, fragments: str = None, inline: bool = False) -> bool:
+
+    sources: list[str] = sorted(
+        os.path.join(directory, fn) for fn in os.listdir(directory) if fn.endswith(suffix)
+    )
+
+    output = directory if output is None else output
+    os.makedirs(output, exist_ok=True)
+
+    targets: list[str] = [
+        os.path.join(output, os.path.basename(src)[:-len(suffix)] + '.tex') for src in sources
+    ]
+
+    failed: int = 0
+    begin: float = time.perf_counter()
+
+    with concurrent.futures.ProcessPoolExecutor(
+        jobs, initializer=init_worker, initargs=(thumbnail_args, fragments, inline)
+    ) as pool:
+
+        # several albums per task, so thousands of small files don't cost a round trip each
+        chunksize: int = max(1, len(sources) // (4 * (jobs or os.cpu_count() or 1)))
+
+        for (src, error) in pool.map(compile_album, sources, targets, chunksize=chunksize):
+
+            if error is None:
+                print(f"==> album '{annotate(src, 1)}' {annotate('passed', 32, 1)}!", file=sys.stderr)
+            else:
+                failed += 1
+                print(
+                    f"==> album '{annotate(src, 1)}' {annotate('failed', 31, 1)}: {error}",
+                    file=sys.stderr
+                )
+
+    elapsed: float = time.perf_counter() - begin
+
+    print(
+        f"{annotate(len(sources) - failed, 32, 1)} passed, {annotate(failed, 31, 1)} failed, "
+        + f"{len(sources)} albums in {elapsed:.2f} s ({len(sources) / elapsed:.1f} albums/s)"
+    )
+
+    return failed == 0
 
 
 def main():
@@ -122,28 +448,109 @@ def main():
 '''
     ]
 
-    parser: lark.Lark = lark.Lark(grammar, start='album')
-    test_count: int   = 1
+    argp: argparse.ArgumentParser = argparse.ArgumentParser()
+    argp.add_argument('--batch', metavar='DIR',
+                      help='compile every album source in DIR instead of the built-in tests')
+    argp.add_argument('--output', metavar='DIR',
+                      help='where the .tex files of a batch go (default: next to the sources)')
+    argp.add_argument('--suffix', default='.album',
+                      help='file name suffix of the album sources in a batch')
+    argp.add_argument('--jobs', type=int, default=None,
+                      help='processes compiling albums (default: one per core)')
+    argp.add_argument('--images', metavar='DIR',
+                      help='where the photos named in the albums are, to link thumbnails of them')
+    argp.add_argument('--thumbnails', metavar='DIR', default='.thumbnails',
+                      help='cache of thumbnails, keyed by the contents of each photo')
+    argp.add_argument('--thumbnail-size', type=int, default=480, metavar='PIXELS',
+                      help='largest side of a thumbnail')
+    argp.add_argument('--fragments', metavar='DIR',
+                      help='reuse the LaTeX of pages rendered before, kept in DIR')
+    argp.add_argument('--inline', action='store_true',
+                      help='write the LaTeX from inside an LALR parser instead of building a tree')
+    argp.add_argument('--profile', action='store_true',
+                      help='time the rule callbacks and report them at the end (not with --batch)')
+    argp.add_argument('--memprofile', action='store_true',
+                      help='trace the memory each phase takes and report it at the end '
+                      + '(not with --batch)')
+    args: argparse.Namespace = argp.parse_args()
+
+    # every file would match, .tex files written by an earlier batch included
+    if args.suffix == '':
+        argp.error('--suffix must not be empty')
+
+    # both work on the tree, before and while it is rendered
+    if args.inline and (args.images is not None or args.fragments is not None):
+        argp.error('--inline builds no tree for --images or --fragments to work on')
+
+    thumbnail_args: tuple = None
+    if args.images is not None:
+        thumbnail_args = (args.thumbnails, args.images, (args.thumbnail_size, args.thumbnail_size))
+
+    if args.batch is not None:
+        if not run_batch(args.batch, args.output, args.suffix, args.jobs, thumbnail_args,
+                         args.fragments, args.inline):
+            sys.exit(1)
+        return
+
+    profiler: CallbackProfiler = CallbackProfiler(args.profile, MemoryProfiler(args.memprofile))
+    names: list[str] = callback_names(lark.Lark(grammar, start='album', parser='lalr')) if args.profile else None
+
+    # the emitter's callbacks are bound into the LALR parser, so it is
+    # instrumented before that is built
+    emitter: AlbumEmitter = profiler.instrument(AlbumEmitter(), names) if args.inline else None
+    parser: lark.Lark     = inline_parser(emitter) if args.inline else lark.Lark(grammar, start='album')
+    test_count: int       = 1
+
+    thumbnails: ThumbnailCache = None
+    if thumbnail_args is not None:
+        thumbnails = ThumbnailCache(*thumbnail_args, jobs=args.jobs)
+
+    fragments: FragmentCache = None
+    if args.fragments is not None:
+        fragments = FragmentCache(args.fragments)
 
     for t in tests:
 
         try:
-            tree: lark.ParseTree = parser.parse(t)
-            at: AlbumInterpreter = AlbumInterpreter()
-            at.transform(tree)
-            at.print_output(f"test{test_count}.tex")
+            if emitter is not None:
+                with open(f"test{test_count}.tex", 'w') as fh:
+                    emitter.begin(fh)
+                    with profiler.phase('parse'):
+                        parser.parse(t)
+
+            else:
+                with profiler.phase('parse'):
+                    tree: lark.ParseTree = parser.parse(t)
+
+                graphics: dict[str, str] = None
+                if thumbnails is not None:
+                    graphics = thumbnails.thumbnails(photo_files(tree))
+
+                with open(f"test{test_count}.tex", 'w') as fh:
+                    ai: AlbumInterpreter = profiler.instrument(AlbumInterpreter(fh, graphics, fragments), names)
+                    with profiler.phase('transform'):
+                        ai.visit(tree)
+
             test_count += 1
 
             print(f"==> test '{annotate(t, 1)}' {annotate('passed', 32, 1)}!", file=sys.stderr)
 
-        except lark.UnexpectedCharacters:
+        # LALR reports unexpected tokens, Earley unexpected characters
+        except SYNTAX_ERRORS:
             print(f"==> test '{annotate(t, 1)}' {annotate('failed', 31, 1)}!", file=sys.stderr)
 
         except lark.GrammarError:
             print(f"==> test '{annotate(t, 1)}' {annotate('failed', 31, 1)}!", file=sys.stderr)
 
+        # a photo Pillow can't read, or thumbnails wanted without Pillow
+        except (OSError, RuntimeError) as e:
+            reason: str = getattr(e, 'strerror', None) or str(e)
+            print(f"==> test '{annotate(t, 1)}' {annotate('failed', 31, 1)}: {reason}", file=sys.stderr)
+
         print("\n")
 
+    profiler.report()
+
 
 if __name__ == '__main__':
     main()
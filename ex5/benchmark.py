@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+import io
+import lark
+import os
+import sys
+import time
+import tracemalloc
+import typing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'bench'))
+
+import albums
+import corpus
+
+
+def earley_interpreter(parser: lark.Lark, text: str, out: typing.TextIO):
+    albums.AlbumInterpreter(out).visit(parser.parse(text))
+
+
+def main():
+
+    sizes: list[int] = [int(n) for n in sys.argv[1:]] or [10**2, 10**3, 10**4]
+
+    earley: lark.Lark = lark.Lark(albums.grammar, start='album')
+
+    emitter: albums.AlbumEmitter = albums.AlbumEmitter()
+    inline: lark.Lark = albums.inline_parser(emitter)
+
+    def run_inline(text: str, out: typing.TextIO):
+        emitter.begin(out)
+        inline.parse(text)
+
+    paths: dict[str, callable] = {
+        'Earley + Interpreter': lambda text, out: earley_interpreter(earley, text, out),
+        'LALR inline emitter':  run_inline,
+    }
+
+    print(f"{'photos':>10} {'path':<21} {'time (s)':>10} {'photos/s':>10} {'peak (MiB)':>11}")
+
+    for n in sizes:
+
+        text: str = corpus.album(n)
+        outputs: list[str] = list()
+
+        for (path, run) in paths.items():
+
+            # Earley's dynamic lexer takes minutes past this
+            if path.startswith('Earley') and n > 2 * 10**4:
+                continue
+
+            out: io.StringIO = io.StringIO()
+
+            begin: float = time.perf_counter()
+            run(text, out)
+            elapsed: float = time.perf_counter() - begin
+
+            outputs.append(out.getvalue())
+
+            # the .tex goes to /dev/null, so only what the path itself holds is counted
+            with open(os.devnull, 'w') as devnull:
+                tracemalloc.start()
+                run(text, devnull)
+                peak: int = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+            print(f"{n:>10} {path:<21} {elapsed:>10.3f} {n / elapsed:>10.0f} {peak / 2**20:>11.1f}")
+
+        assert all(o == outputs[0] for o in outputs), 'the paths wrote different LaTeX'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import lark
+import hashlib
+import marshal
+import typing
+
+from disk_cache import DiskCache, encode
+
+
+# bump whenever AlbumInterpreter renders a page differently
+FORMAT_VERSION: int = 1
+
+
+class FragmentCache(DiskCache):
+
+    # The LaTeX of every album page, kept on disk under a hash of the page's
+    # subtree and of the graphics its photos resolve to. A fragment is stored
+    # as the pieces between its figure label numbers, which are only filled
+    # in when the page is spliced into the document: adding a photo to one
+    # page renumbers the figures after it without invalidating their pages.
+    # Entries are evicted by least recent use as DiskCache does.
+
+    hits: int
+    misses: int
+
+    def __init__(self, directory: str, max_bytes: int = 64 * 2**20):
+        super().__init__(directory, '.frag', max_bytes)
+
+        self.hits   = 0
+        self.misses = 0
+
+    def key(self, page: lark.Tree, graphics: dict[str, str]) -> str:
+
+        h = hashlib.sha256(f"{FORMAT_VERSION}\0".encode())
+        h.update(marshal.dumps(encode(page)))
+
+        for t in page.scan_values(lambda v: isinstance(v, lark.Token) and v.type == 'FILE'):
+            h.update(f"\0{t}\0{graphics.get(t, t)}".encode())
+
+        return h.hexdigest()
+
+    def get(self, key: str) -> typing.Optional[list[str]]:
+
+        data: bytes = self.read(key)
+
+        if data is None:
+            self.misses += 1
+            return None
+
+        # a truncated or otherwise damaged entry is a miss, and removed so
+        # that the page rendered in its place replaces it
+        try:
+            pieces: list[str] = marshal.loads(data)
+        except (EOFError, ValueError, TypeError):
+            pieces = None
+
+        if not isinstance(pieces, list) or not pieces or not all(isinstance(p, str) for p in pieces):
+            self.discard(key)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return pieces
+
+    def put(self, key: str, pieces: list[str]):
+        self.write(key, marshal.dumps(pieces))
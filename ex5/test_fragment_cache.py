@@ -0,0 +1,80 @@
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+import lark
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import albums
+from fragment_cache import FragmentCache
+
+
+ALBUM: str = '''
+"Um passeio" "Joaozinho" 03-04-2000
+[ "Cascata" img1 "Vista da cascata." img2 "Outra." "Soajo" img3 "Casa." ]
+"Fim" 03-05-2000
+'''
+
+
+def render(tree: lark.Tree, fragments: FragmentCache = None) -> str:
+    out: io.StringIO = io.StringIO()
+    albums.AlbumInterpreter(out, fragments=fragments).visit(tree)
+    return out.getvalue()
+
+
+class DamagedEntryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.tree = lark.Lark(albums.grammar, start='album').parse(ALBUM)
+        self.expected = render(self.tree)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def damage(self, data: bytes):
+        for fn in os.listdir(self.directory.name):
+            with open(os.path.join(self.directory.name, fn), 'wb') as fh:
+                fh.write(data)
+
+    def assert_renders_again(self):
+
+        fragments: FragmentCache = FragmentCache(self.directory.name)
+
+        self.assertEqual(render(self.tree, fragments), self.expected)
+        self.assertEqual(fragments.hits, 0)
+
+        # the damaged entries were replaced, and are hits from then on
+        self.assertEqual(render(self.tree, fragments), self.expected)
+        self.assertGreater(fragments.hits, 0)
+
+    def test_truncated_entry_is_a_miss(self):
+
+        self.assertEqual(render(self.tree, FragmentCache(self.directory.name)), self.expected)
+
+        for fn in os.listdir(self.directory.name):
+            path: str = os.path.join(self.directory.name, fn)
+            os.truncate(path, os.path.getsize(path) // 2)
+
+        self.assert_renders_again()
+
+    def test_garbage_entry_is_a_miss(self):
+
+        render(self.tree, FragmentCache(self.directory.name))
+        self.damage(b'\xff\x00garbage')
+
+        self.assert_renders_again()
+
+    def test_entry_of_another_type_is_a_miss(self):
+
+        render(self.tree, FragmentCache(self.directory.name))
+        self.damage(b'i\x07\x00\x00\x00')  # marshal of the int 7
+
+        self.assert_renders_again()
+
+
+if __name__ == '__main__':
+    unittest.main()
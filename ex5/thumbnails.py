@@ -0,0 +1,190 @@
+import concurrent.futures
+import contextlib
+import hashlib
+import json
+import os
+import typing
+
+# Pillow is only needed once a thumbnail actually has to be made
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# saving the index is only serialized where there is flock()
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# what a FILE token may stand for, in the order they are tried
+EXTENSIONS: tuple[str, ...] = ('.jpg', '.jpeg', '.png', '.pdf', '.gif', '.bmp', '.tif', '.tiff', '.webp')
+
+
+def make_thumbnail(src: str, dst: str, size: tuple[int, int]):
+
+    if Image is None:
+        raise RuntimeError('making thumbnails needs Pillow (pip install pillow)')
+
+    with Image.open(src) as img:
+
+        img.thumbnail(size)
+
+        if dst.endswith('.jpg') and img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+
+        # written aside and renamed, so a reader never sees half a thumbnail
+        tmp: str = f"{dst}.{os.getpid()}.tmp"
+        img.save(tmp, 'JPEG' if dst.endswith('.jpg') else 'PNG')
+        os.replace(tmp, dst)
+
+
+class ThumbnailCache:
+
+    # Down-scaled copies of the album photos, named after a hash of the
+    # original's contents and the thumbnail size: an image that didn't change
+    # is never scaled again, whatever it is called or wherever it lives.
+    # Hashing every photo on every run would still mean reading them all, so
+    # index.json remembers the hash of each path along with its size and
+    # mtime. Missing thumbnails are made in a process pool, or right here
+    # with jobs=0 (as a batch worker does, already being one of a pool).
+    #
+    # The workers of a batch share index.json, so each one merges the hashes
+    # it worked out into what is on disk when it saves, rather than writing
+    # its own copy over the others', holding a lock on index.lock meanwhile.
+
+    _directory: str
+    _images: str
+    _size: tuple[int, int]
+    _jobs: int
+
+    _index: dict[str, list]
+
+    # entries of _index worked out since it was last saved
+    _fresh: dict[str, list]
+
+    def __init__(self, directory: str, images: str, size: tuple[int, int] = (480, 480),
+                 jobs: int = None):
+        self._directory     = directory
+        self._images        = images
+        self._size          = size
+        self._jobs          = jobs
+
+        self._fresh         = dict()
+
+        os.makedirs(directory, exist_ok=True)
+
+        self._index         = self._load_index()
+
+    def _index_path(self) -> str:
+        return os.path.join(self._directory, 'index.json')
+
+    def _load_index(self) -> dict[str, list]:
+
+        try:
+            with open(self._index_path()) as fh:
+                return json.load(fh)
+        except (FileNotFoundError, ValueError):
+            return dict()
+
+    @contextlib.contextmanager
+    def _index_lock(self):
+
+        if fcntl is None:
+            yield
+            return
+
+        with open(os.path.join(self._directory, 'index.lock'), 'w') as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            yield
+
+    def _save_index(self):
+
+        with self._index_lock():
+
+            index: dict[str, list] = self._load_index()
+            index.update(self._fresh)
+
+            # written aside and renamed, so a reader never sees half an index
+            tmp: str = f"{self._index_path()}.{os.getpid()}.tmp"
+            with open(tmp, 'w') as fh:
+                json.dump(index, fh)
+            os.replace(tmp, self._index_path())
+
+        self._index = index
+        self._fresh = dict()
+
+    # the image a FILE token refers to, if there is one
+    def locate(self, name: str) -> typing.Optional[str]:
+
+        for ext in EXTENSIONS:
+            path: str = os.path.join(self._images, name + ext)
+            if os.path.isfile(path):
+                return path
+
+        return None
+
+    def _digest(self, path: str) -> str:
+
+        st: os.stat_result = os.stat(path)
+        key: str = os.path.abspath(path)
+
+        entry: list = self._index.get(key)
+        if entry is not None and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            return entry[2]
+
+        h = hashlib.sha256()
+        with open(path, 'rb') as fh:
+            while chunk := fh.read(2**20):
+                h.update(chunk)
+
+        self._index[key] = self._fresh[key] = [st.st_size, st.st_mtime_ns, h.hexdigest()]
+
+        return h.hexdigest()
+
+    def _thumbnail_path(self, path: str) -> str:
+
+        # a vector pdf is kept as it is, the rest keep JPEG's or PNG's compression
+        ext: str = os.path.splitext(path)[1].lower()
+        if ext == '.pdf':
+            return path
+
+        (w, h) = self._size
+        out: str = '.jpg' if ext in ('.jpg', '.jpeg') else '.png'
+
+        return os.path.join(self._directory, f"{self._digest(path)}-{w}x{h}{out}")
+
+    # FILE name -> thumbnail path relative to `relative_to`, where the .tex goes;
+    # names without an image are left out and end up pointing at themselves
+    def thumbnails(self, names: typing.Iterable[str], relative_to: str = '.') -> dict[str, str]:
+
+        graphics: dict[str, str] = dict()
+        missing: dict[str, str] = dict()
+
+        for name in dict.fromkeys(names):
+
+            path: str = self.locate(name)
+            if path is None:
+                continue
+
+            thumb: str = self._thumbnail_path(path)
+            if thumb != path and not os.path.exists(thumb):
+                missing[thumb] = path
+
+            graphics[name] = os.path.relpath(thumb, relative_to)
+
+        if self._jobs == 0 or len(missing) <= 1:
+            for (thumb, path) in missing.items():
+                make_thumbnail(path, thumb, self._size)
+
+        else:
+            with concurrent.futures.ProcessPoolExecutor(self._jobs) as pool:
+                for _ in pool.map(make_thumbnail, missing.values(), missing.keys(),
+                                  [self._size] * len(missing)):
+                    pass
+
+        if self._fresh:
+            self._save_index()
+
+        return graphics